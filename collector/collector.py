@@ -7,15 +7,18 @@ Supports multiple brands: Thermia, IVT
 
 import os
 import sys
+import math
 import time
-import json
+import queue
+import socket
+import threading
 import yaml
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
 
 import paho.mqtt.client as mqtt
-from influxdb_client import InfluxDBClient, Point
+from influxdb_client import InfluxDBClient, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
 
 # Add parent directory to path for provider imports
@@ -24,6 +27,12 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from providers import get_provider
 from metrics import MetricsProcessor
 
+# Prefer libyaml's C parser when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,10 +40,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# InfluxDB measurement name for all heat pump metrics
+MEASUREMENT = "heatpump"
+
+# Max queued MQTT messages waiting for the writer thread
+MAX_QUEUE_SIZE = 10_000
+
+# Default max messages handed to the write API in one call
+# (collection.batch_max_messages in config.yaml)
+WRITE_BATCH_SIZE = 500
+
+# Default time to keep collecting after the first message of a burst
+# (collection.batch_max_delay_ms in config.yaml, here in seconds).
+# The H66 publishes all registers within a few hundred ms of each other.
+FLUSH_WINDOW_SECONDS = 0.25
+
+# Max payload per UDP datagram when writing via a UDP line protocol listener
+UDP_MAX_DATAGRAM_SIZE = 8192
+
+# Minimum time between summaries of stored metrics (seconds)
+STATS_LOG_INTERVAL_SECONDS = 60
+
+
+def _escape_tag(value: str) -> str:
+    """Escape a tag key/value for InfluxDB line protocol"""
+    return str(value).replace('\\', '\\\\').replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
 
 class HeatPumpCollector:
     """Main collector class for heat pump data (supports multiple brands)"""
 
+    __slots__ = (
+        'config', 'provider', 'mqtt_client', 'influx_client', 'write_api',
+        'bucket', 'udp_socket', 'udp_target', 'metrics_processor', 'topic_map',
+        'message_queue', 'writer_thread', 'batch_size', 'flush_window',
+        'line_buffer', 'stored_count',
+        'stats_since', 'subscribed'
+    )
+
     def __init__(self, config_path: str = '/app/config.yaml'):
         """Initialize the collector with configuration"""
         self.config = self._load_config(config_path)
@@ -54,8 +97,22 @@ class HeatPumpCollector:
         self.mqtt_client = None
         self.influx_client = None
         self.write_api = None
+        self.bucket = None
+        self.udp_socket = None
+        self.udp_target = None
         self.metrics_processor = MetricsProcessor(self.config)
-        self.connected = False
+        self.topic_map = self._build_topic_map()
+        self.message_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+        self.writer_thread = None
+        collection_config = self.config.get('collection') or {}
+        self.batch_size = max(1, int(collection_config.get('batch_max_messages', WRITE_BATCH_SIZE)))
+        self.flush_window = float(collection_config.get('batch_max_delay_ms', FLUSH_WINDOW_SECONDS * 1000)) / 1000
+        self.line_buffer = bytearray()  # Reused by the writer thread for each batch
+        self.stored_count = 0
+        self.stats_since = time.monotonic()  # Start of the current summary period
+        
+        # Set once the register topics have been subscribed in this process
+        self.subscribed = False
         
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from YAML file or environment variables"""
@@ -64,7 +121,7 @@ class HeatPumpCollector:
         if os.path.exists(config_path):
             try:
                 with open(config_path, 'r') as f:
-                    config = yaml.safe_load(f)
+                    config = yaml.load(f, Loader=YamlLoader)
                 logger.info("Configuration loaded from file")
                 return config
             except Exception as e:
@@ -88,7 +145,9 @@ class HeatPumpCollector:
             'collection': {
                 'interval_seconds': int(os.getenv('COLLECTION_INTERVAL', '300')),
                 'retry_attempts': int(os.getenv('RETRY_ATTEMPTS', '5')),
-                'retry_delay': int(os.getenv('RETRY_DELAY', '10'))
+                'retry_delay': int(os.getenv('RETRY_DELAY', '10')),
+                'batch_max_messages': int(os.getenv('BATCH_MAX_MESSAGES', str(WRITE_BATCH_SIZE))),
+                'batch_max_delay_ms': int(os.getenv('BATCH_MAX_DELAY_MS', str(int(FLUSH_WINDOW_SECONDS * 1000))))
             },
             'influxdb': {},
             'registers': {},  # Will be loaded from provider
@@ -109,6 +168,10 @@ class HeatPumpCollector:
             org = os.getenv('INFLUXDB_ORG', 'thermia')
             bucket = os.getenv('INFLUXDB_BUCKET', 'heatpump')
             
+            # Synchronous writes - batching is done by the writer thread
+            # (collection.batch_max_messages / batch_max_delay_ms), so each
+            # write call is one HTTP request and errors reach _write_batch
+            self.bucket = bucket
             self.influx_client = InfluxDBClient(url=url, token=token, org=org)
             self.write_api = self.influx_client.write_api(write_options=SYNCHRONOUS)
             
@@ -116,6 +179,15 @@ class HeatPumpCollector:
             health = self.influx_client.health()
             logger.info(f"InfluxDB connection established: {health.status}")
             
+            # Optional UDP transport (InfluxDB 1.x [[udp]] or Telegraf
+            # socket_listener). The listener must use second precision.
+            udp_port = os.getenv('INFLUXDB_UDP_PORT')
+            if udp_port:
+                udp_host = os.getenv('INFLUXDB_UDP_HOST') or urlparse(url).hostname
+                self.udp_target = (udp_host, int(udp_port))
+                self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                logger.info(f"Writing metrics via UDP to {udp_host}:{udp_port}")
+            
         except Exception as e:
             logger.error(f"Failed to setup InfluxDB: {e}")
             raise
@@ -124,7 +196,9 @@ class HeatPumpCollector:
         """Setup MQTT client and callbacks"""
         mqtt_config = self.config['mqtt']
         
-        self.mqtt_client = mqtt.Client(client_id=mqtt_config['client_id'])
+        # Persistent session: the broker keeps our subscriptions and queues
+        # QoS>=1 messages across reconnects (client_id must stay stable)
+        self.mqtt_client = mqtt.Client(client_id=mqtt_config['client_id'], clean_session=False)
         self.mqtt_client.username_pw_set(
             mqtt_config['username'],
             mqtt_config['password']
@@ -150,101 +224,203 @@ class HeatPumpCollector:
     def _on_connect(self, client, userdata, flags, rc):
         """Callback when connected to MQTT broker"""
         if rc == 0:
-            self.connected = True
             logger.info("Successfully connected to MQTT broker")
             
-            # Subscribe to all topics from H66
-            h66_mac = self.config['mqtt']['h66_mac']
+            # Disable Nagle's algorithm so small MQTT packets aren't delayed
+            sock = client.socket()
+            if sock is not None:
+                try:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                except OSError as e:
+                    logger.debug(f"Could not set TCP_NODELAY on MQTT socket: {e}")
             
-            # Subscribe to individual register updates
-            topic = f"{h66_mac}/HP/#"
-            client.subscribe(topic)
-            logger.info(f"Subscribed to topic: {topic}")
+            # On reconnect the broker still has our subscriptions. Always
+            # subscribe once per process, since the register set may have
+            # changed since the session was created.
+            if self.subscribed and flags.get('session present'):
+                logger.info("Resumed persistent MQTT session, keeping subscriptions")
+                return
             
-            # Subscribe to status updates
-            status_topic = f"{h66_mac}/HP/STATUS/#"
-            client.subscribe(status_topic)
-            logger.info(f"Subscribed to topic: {status_topic}")
+            # Subscribe only to known register topics (HP/<id> and
+            # HP/STATUS/<id>) in a single SUBSCRIBE, so the broker drops
+            # unknown registers instead of delivering them to us
+            qos = self.config['mqtt'].get('qos', 0)
+            client.subscribe([(topic, qos) for topic in self.topic_map])
+            self.subscribed = True
+            logger.info(f"Subscribed to {len(self.topic_map)} register topics for {self.config['mqtt']['h66_mac']}")
             
         else:
-            self.connected = False
             logger.error(f"Failed to connect to MQTT broker. Return code: {rc}")
     
     def _on_disconnect(self, client, userdata, rc):
         """Callback when disconnected from MQTT broker"""
-        self.connected = False
         if rc != 0:
             logger.warning(f"Unexpected disconnect from MQTT broker. Return code: {rc}")
         else:
             logger.info("Disconnected from MQTT broker")
     
+    def _build_topic_map(self) -> Dict[str, Tuple[str, Dict[str, Any], bytes]]:
+        """
+        Build lookup table from full MQTT topic to
+        (register ID, register info, line protocol prefix)
+        
+        Topic format: <mac>/HP/<register_id> or <mac>/HP/STATUS/<register_id>
+        Both upper- and lowercase register IDs are mapped, so incoming
+        messages need a single dict lookup to get everything needed to
+        process and encode them. All topic variants of a register share
+        one entry tuple, built in a single pass over the registers.
+        """
+        h66_mac = self.config['mqtt']['h66_mac']
+        topic_map = {}
+        
+        for register_id, register_info in self.config['registers'].items():
+            register_id_upper = sys.intern(register_id.upper())
+            entry = (register_id_upper, register_info, self._render_line_prefix(register_id_upper, register_info))
+            for variant in (register_id_upper, register_id.lower()):
+                topic_map[f"{h66_mac}/HP/{variant}"] = entry
+                topic_map[f"{h66_mac}/HP/STATUS/{variant}"] = entry
+        
+        return topic_map
+    
+    def _render_line_prefix(self, register_id: str, register_info: Dict[str, Any]) -> bytes:
+        """
+        Pre-render the line protocol measurement + tag set for a register
+        
+        Tags never change for a register, so only the field value and
+        timestamp have to be formatted per message.
+        """
+        tags = {
+            'register_id': register_id,
+            'name': register_info['name'],
+            'type': register_info['type']
+        }
+        # Add unit as tag if present
+        if register_info.get('unit'):
+            tags['unit'] = register_info['unit']
+        
+        tag_set = ','.join(f"{_escape_tag(k)}={_escape_tag(v)}" for k, v in sorted(tags.items()))
+        return f"{MEASUREMENT},{tag_set}".encode('utf-8')
+    
     def _on_message(self, client, userdata, msg):
         """Callback when message received from MQTT"""
+        # paho decodes msg.topic on every access, so read it once
+        topic = msg.topic
         try:
-            topic = msg.topic
-            payload = msg.payload.decode('utf-8')
+            entry = self.topic_map.get(topic)
             
-            logger.debug(f"Received message on topic {topic}: {payload}")
-            
-            # Extract register ID from topic
-            # Topic format: <mac>/HP/<register_id> or <mac>/HP/STATUS/<register_id>
-            parts = topic.split('/')
+            if entry is None:
+                logger.debug(f"Unknown register topic: {topic}")
+                return
             
-            if len(parts) >= 3:
-                # Get register ID
-                if parts[2] == 'STATUS' and len(parts) >= 4:
-                    register_id = parts[3]
-                else:
-                    register_id = parts[2]
-                
-                # Process and store the metric
-                self._process_metric(register_id, payload)
+            # Only enqueue here - parsing and InfluxDB writes happen on the
+            # writer thread so paho's network loop is never blocked
+            timestamp = time.time_ns() // 1_000_000_000
+            self.message_queue.put_nowait((entry, msg.payload, timestamp))
             
+        except queue.Full:
+            logger.warning(f"Write queue full, dropping message from {topic}")
         except Exception as e:
-            logger.error(f"Error processing message from {msg.topic}: {e}")
+            logger.error(f"Error processing message from {topic}: {e}")
     
-    def _process_metric(self, register_id: str, value: str):
-        """Process and store a metric in InfluxDB"""
-        try:
-            # Get metric info from configuration
-            register_id_upper = register_id.upper()
-            
-            if register_id_upper not in self.config['registers']:
-                logger.debug(f"Unknown register: {register_id_upper}")
+    def _writer_loop(self):
+        """
+        Drain queued messages and write them to InfluxDB in batches
+        
+        After the first message of a burst arrives, keep collecting for
+        the flush window so a whole gateway update goes out as one write.
+        """
+        while True:
+            item = self.message_queue.get()
+            if item is None:
                 return
             
-            register_info = self.config['registers'][register_id_upper]
+            batch = [item]
+            deadline = time.monotonic() + self.flush_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.message_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write_batch(batch)
+                    return
+                batch.append(item)
             
-            # Convert value based on type
-            processed_value = self.metrics_processor.process_value(
-                register_id_upper,
-                value,
-                register_info
+            self._write_batch(batch)
+    
+    def _write_batch(self, batch: list):
+        """Process a batch of queued messages and write them in one call"""
+        line_buffer = self.line_buffer
+        line_buffer.clear()
+        count = 0
+        debug = logger.isEnabledFor(logging.DEBUG)
+        
+        # Convert all values in one call, then encode the valid ones. The
+        # writer is a single thread - a bad batch is logged and dropped
+        # instead of killing it and silently filling the queue.
+        try:
+            values = self.metrics_processor.process_batch(
+                [(register_id, value, register_info) for (register_id, register_info, _), value, _ in batch]
             )
             
-            if processed_value is None:
-                return
-            
-            # Create InfluxDB point
-            point = Point("heatpump") \
-                .tag("register_id", register_id_upper) \
-                .tag("name", register_info['name']) \
-                .tag("type", register_info['type']) \
-                .field("value", processed_value) \
-                .time(datetime.utcnow())
-            
-            # Add unit as tag if present
-            if register_info.get('unit'):
-                point = point.tag("unit", register_info['unit'])
-            
-            # Write to InfluxDB
-            bucket = os.getenv('INFLUXDB_BUCKET', 'heatpump')
-            self.write_api.write(bucket=bucket, record=point)
-            
-            logger.info(f"Stored metric: {register_info['name']} = {processed_value} {register_info.get('unit', '')}")
-            
+            for ((register_id, register_info, line_prefix), _, timestamp), processed_value in zip(batch, values):
+                if not math.isfinite(processed_value):
+                    continue
+                
+                if debug:
+                    logger.debug("Stored metric: %s = %s %s", register_info.get('name', register_id),
+                                 processed_value, register_info.get('unit', ''))
+                
+                # Line protocol record: pre-rendered tags + value + timestamp
+                line_buffer += b'%b value=%r %d\n' % (line_prefix, processed_value, timestamp)
+                count += 1
         except Exception as e:
-            logger.error(f"Error storing metric {register_id}: {e}")
+            logger.error("Error processing %d queued messages: %s", len(batch), e)
+            return
+        
+        if not count:
+            return
+        
+        try:
+            if self.udp_socket is not None:
+                self._send_udp(line_buffer)
+            else:
+                self.write_api.write(bucket=self.bucket, record=bytes(line_buffer), write_precision=WritePrecision.S)
+        except Exception as e:
+            logger.error(f"Error writing {count} metrics to InfluxDB: {e}")
+            return
+        
+        # Periodic summary instead of one info line per metric
+        self.stored_count += count
+        now = time.monotonic()
+        elapsed = now - self.stats_since
+        # Only checked after a successful write, so after a quiet spell or an
+        # InfluxDB outage the period can be longer - log the actual length
+        if elapsed >= STATS_LOG_INTERVAL_SECONDS:
+            logger.info("Stored %d metrics in last %.0fs", self.stored_count, elapsed)
+            self.stored_count = 0
+            self.stats_since = now
+    
+    def _send_udp(self, data: bytearray):
+        """Send line protocol over UDP, split at line boundaries into datagrams"""
+        start = 0
+        end_of_data = len(data)
+        
+        while start < end_of_data:
+            end = start + UDP_MAX_DATAGRAM_SIZE
+            if end >= end_of_data:
+                end = end_of_data
+            else:
+                # Cut after the last complete line that fits; a single
+                # oversized line is sent on its own
+                cut = data.rfind(b'\n', start, end)
+                end = cut + 1 if cut >= start else data.find(b'\n', end) + 1 or end_of_data
+            
+            self.udp_socket.sendto(data[start:end], self.udp_target)
+            start = end
     
     def run(self):
         """Main run loop"""
@@ -255,21 +431,25 @@ class HeatPumpCollector:
         self._setup_influxdb()
         self._setup_mqtt()
 
-        # Start MQTT loop
-        self.mqtt_client.loop_start()
+        # InfluxDB writes run on a worker thread fed by _on_message
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="influx-writer", daemon=True)
+        self.writer_thread.start()
 
-        # Keep running
+        # Run the MQTT network loop on the main thread; paho reconnects
+        # automatically after unexpected disconnects
         try:
-            while True:
-                if not self.connected:
-                    logger.warning("Not connected to MQTT broker, waiting...")
-                time.sleep(10)
+            self.mqtt_client.loop_forever(retry_first_connection=True)
 
         except KeyboardInterrupt:
             logger.info("Shutting down collector...")
-            self.mqtt_client.loop_stop()
             self.mqtt_client.disconnect()
+            # Let the writer drain the queue before closing the clients
+            self.message_queue.put(None)
+            self.writer_thread.join(timeout=10)
+            self.write_api.close()
             self.influx_client.close()
+            if self.udp_socket is not None:
+                self.udp_socket.close()
 
 
 if __name__ == "__main__":
@@ -4,161 +4,269 @@ Handles data conversion and validation for different metric types
 """
 
 import logging
-from typing import Any, Dict, Optional
+import math
+import sys
+from typing import Any, Callable, Dict, List, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Plausible (min, max) per metric type, used by validate_metric.
+# Types not listed here (status, setting, runtime, ...) always validate.
+_VALIDATION_BOUNDS = {
+    'temperature': (-50.0, 150.0),
+    'power': (0.0, 50000.0),  # Max 50kW seems reasonable
+    'energy': (0.0, math.inf),
+    'percentage': (0.0, 100.0),
+    'alarm': (0.0, math.inf),
+}
+
+
+# Above this magnitude scaling by 100 loses float precision, and int()
+# would fail on inf/nan - such values are passed through unrounded
+_QUANTIZE_LIMIT = 1e13
+
+
+def _round1(value: float) -> float:
+    """
+    Round to one decimal, halves away from zero
+    
+    Integer arithmetic instead of round(): the readings only need display
+    precision, and banker's rounding of exact halves makes no difference here.
+    """
+    if -_QUANTIZE_LIMIT < value < _QUANTIZE_LIMIT:
+        return int(value * 10.0 + (0.5 if value >= 0 else -0.5)) / 10.0
+    return value
+
+
+def _round2(value: float) -> float:
+    """Round to two decimals, halves away from zero (see _round1)"""
+    if -_QUANTIZE_LIMIT < value < _QUANTIZE_LIMIT:
+        return int(value * 100.0 + (0.5 if value >= 0 else -0.5)) / 100.0
+    return value
+
+
+# Numeric kernels - plain float -> float functions with no instance state
+
+def _process_temperature(value: float) -> float:
+    """
+    Process temperature values
+    
+    NOTE: Some H66 firmwares send temperatures already in correct format (54.0 for 54°C)
+    while older firmwares send multiplied by 10 (540 for 54°C).
+    
+    This version handles H66s that send actual values (no multiplication).
+    If your temps are 10x too large, you may have an older H66 that needs division by 10.
+    
+    Also handles negative temperatures sent via two's complement encoding.
+    """
+    # Negative temperatures arrive as 16-bit unsigned two's complement.
+    # Subtract 65536 when above 32768 without branching on the sign; the
+    # comparison is used as 0/1 so fractional readings are kept intact
+    # (an int() based sign-extend would truncate 21.5 to 21).
+    temp = value - 65536 * (value > 32768)
+    
+    # Sanity check: temperatures should be reasonable
+    if temp < -50 or temp > 150:
+        logger.warning("Temperature out of range: %s°C, raw MQTT value was: %s", temp, value)
+        return math.nan
+    
+    return _round1(temp)
+
+
+def _process_status(value: float) -> float:
+    """
+    Process status values (typically 0 or 1)
+    """
+    # Status values are typically 0 (off) or 1 (on)
+    # Sometimes they can be other values, so we keep the raw value
+    return value
+
+
+def _process_power(value: float) -> float:
+    """
+    Process power consumption values (Watts)
+    """
+    # Power values should be positive
+    if value < 0:
+        logger.warning("Negative power value: %s", value)
+        return 0.0
+    
+    return _round1(value)
+
+
+def _process_energy(value: float) -> float:
+    """
+    Process accumulated energy values (kWh)
+    """
+    # Energy values should be positive
+    if value < 0:
+        logger.warning("Negative energy value: %s", value)
+        return 0.0
+    
+    return _round2(value)
+
+
+def _process_percentage(value: float) -> float:
+    """
+    Process percentage values (0-100)
+    """
+    # Clamp to valid percentage range
+    if value < 0:
+        return 0.0
+    if value > 100:
+        return 100.0
+    
+    return _round1(value)
+
+
+def _process_setting(value: float) -> float:
+    """
+    Process setting values (heat curve, operating mode, etc.)
+    
+    H66 sends settings in their actual format - no conversion needed
+    """
+    return value
+
+
+def _process_alarm(value: float) -> float:
+    """
+    Process alarm codes
+    0 = no alarm, other values indicate alarm codes
+    Return as float to match InfluxDB field type
+    """
+    return float(value)
+
+
+def _process_runtime(value: float) -> float:
+    """
+    Process runtime values (hours)
+    Runtime counters should always be positive
+    """
+    if value < 0:
+        logger.warning("Negative runtime value: %s", value)
+        return 0.0
+    
+    return _round1(value)
+
 
 class MetricsProcessor:
     """Process and convert heat pump metrics"""
     
+    __slots__ = ('config', '_handlers', '_register_handlers', '_register_bounds')
+    
     def __init__(self, config: Dict[str, Any]):
         """Initialize with configuration"""
         self.config = config
+        # Type -> conversion kernel, looked up once per value
+        self._handlers = {
+            'temperature': _process_temperature,
+            'status': _process_status,
+            'power': _process_power,
+            'energy': _process_energy,
+            'percentage': _process_percentage,
+            'setting': _process_setting,
+            'alarm': _process_alarm,
+            'runtime': _process_runtime,
+        }
+        # Register ID -> kernel, resolved once so known registers skip the
+        # type lookup entirely
+        self._register_handlers = self._build_register_handlers(config.get('registers', {}))
+        # Register ID -> (min, max) for validate_metric, keyed like
+        # _register_handlers (original and interned uppercase ID)
+        self._register_bounds = self._build_register_bounds(config.get('registers', {}))
     
-    def process_value(self, register_id: str, raw_value: str, register_info: Dict[str, Any]) -> Optional[float]:
+    def _build_register_handlers(self, registers: Dict[str, Any]) -> Dict[str, Callable[[float], float]]:
+        """
+        Resolve the conversion kernel for every configured register
+        
+        Registers with an unknown type are left out and take the slow path.
+        """
+        register_handlers = {}
+        for register_id, register_info in registers.items():
+            handler = self._handlers.get((register_info or {}).get('type'))
+            if handler is not None:
+                register_handlers[register_id] = handler
+                register_handlers[sys.intern(register_id.upper())] = handler
+        return register_handlers
+    
+    def _build_register_bounds(self, registers: Dict[str, Any]) -> Dict[str, Tuple[float, float]]:
+        """Resolve the validation bounds for every configured register with a bounded type"""
+        register_bounds = {}
+        for register_id, register_info in registers.items():
+            bounds = _VALIDATION_BOUNDS.get((register_info or {}).get('type'))
+            if bounds is not None:
+                register_bounds[register_id] = bounds
+                register_bounds[sys.intern(register_id.upper())] = bounds
+        return register_bounds
+    
+    def process_value(self, register_id: str, raw_value: Union[str, bytes, float], register_info: Dict[str, Any]) -> float:
         """
         Process a raw value based on its type
         
         Args:
             register_id: Register identifier
-            raw_value: Raw value from MQTT
+            raw_value: Raw value from MQTT (str or undecoded payload bytes),
+                or an already numeric value
             register_info: Register configuration
             
         Returns:
-            Processed numeric value or None if invalid
+            Processed numeric value, or NaN if invalid
         """
-        try:
-            metric_type = register_info.get('type', 'unknown')
-            
-            # Convert to number
+        # Convert to number - float() parses payload bytes directly, so
+        # the payload is only decoded when it has to be logged. Values that
+        # are already numeric skip parsing, and empty payloads (cleared
+        # retained messages) are rejected without raising.
+        if isinstance(raw_value, (float, int)):
+            value = float(raw_value)
+        elif not raw_value:
+            logger.warning("Empty value for %s", register_id)
+            return math.nan
+        else:
             try:
                 value = float(raw_value)
             except (ValueError, TypeError):
-                logger.warning(f"Invalid numeric value for {register_id}: {raw_value}")
-                return None
-            
-            # Process based on type
-            if metric_type == 'temperature':
-                return self._process_temperature(value)
-            elif metric_type == 'status':
-                return self._process_status(value)
-            elif metric_type == 'power':
-                return self._process_power(value)
-            elif metric_type == 'energy':
-                return self._process_energy(value)
-            elif metric_type == 'percentage':
-                return self._process_percentage(value)
-            elif metric_type == 'setting':
-                return self._process_setting(value)
-            elif metric_type == 'alarm':
-                return self._process_alarm(value)
-            elif metric_type == 'runtime':
-                return self._process_runtime(value)
-            else:
-                # Unknown type, return as-is
-                return value
-                
-        except Exception as e:
-            logger.error(f"Error processing value for {register_id}: {e}")
-            return None
-    
-    def _process_temperature(self, value: float) -> Optional[float]:
-        """
-        Process temperature values
-        
-        NOTE: Some H66 firmwares send temperatures already in correct format (54.0 for 54°C)
-        while older firmwares send multiplied by 10 (540 for 54°C).
-        
-        This version handles H66s that send actual values (no multiplication).
-        If your temps are 10x too large, you may have an older H66 that needs division by 10.
-        
-        Also handles negative temperatures sent via two's complement encoding.
-        """
-        # Check if this is a negative temperature (two's complement encoding)
-        # This happens for negative values in 16-bit unsigned representation
-        if value > 32768:
-            # This is a negative temperature in two's complement
-            value = value - 65536
+                if isinstance(raw_value, bytes):
+                    raw_value = raw_value.decode('utf-8', errors='replace')
+                logger.warning("Invalid numeric value for %s: %s", register_id, raw_value)
+                return math.nan
         
-        # H66 sends actual temperature value - NO division needed
-        temp = value
-        
-        # Sanity check: temperatures should be reasonable
-        if temp < -50 or temp > 150:
-            logger.warning(f"Temperature out of range: {temp}°C, raw MQTT value was: {value}")
-            return None
-        
-        return round(temp, 1)
-    
-    def _process_status(self, value: float) -> float:
-        """
-        Process status values (typically 0 or 1)
-        """
-        # Status values are typically 0 (off) or 1 (on)
-        # Sometimes they can be other values, so we keep the raw value
-        return value
-    
-    def _process_power(self, value: float) -> float:
-        """
-        Process power consumption values (Watts)
-        """
-        # Power values should be positive
-        if value < 0:
-            logger.warning(f"Negative power value: {value}")
-            return 0.0
-        
-        return round(value, 1)
-    
-    def _process_energy(self, value: float) -> float:
-        """
-        Process accumulated energy values (kWh)
-        """
-        # Energy values should be positive
-        if value < 0:
-            logger.warning(f"Negative energy value: {value}")
-            return 0.0
-        
-        return round(value, 2)
+        # Process based on type - unknown types are returned as-is
+        handler = self._register_handlers.get(register_id)
+        if handler is None:
+            handler = self._handlers.get(register_info.get('type'))
+            if handler is None:
+                return value
+        return handler(value)
     
-    def _process_percentage(self, value: float) -> float:
-        """
-        Process percentage values (0-100)
+    def process_batch(self, items: List[Tuple[str, Union[str, bytes, float], Dict[str, Any]]]) -> List[float]:
         """
-        # Clamp to valid percentage range
-        if value < 0:
-            return 0.0
-        if value > 100:
-            return 100.0
+        Process a batch of raw values in one call
         
-        return round(value, 1)
-    
-    def _process_setting(self, value: float) -> float:
+        Args:
+            items: List of (register_id, raw_value, register_info) tuples
+            
+        Returns:
+            Processed values in input order, NaN where a value is invalid
         """
-        Process setting values (heat curve, operating mode, etc.)
+        # Inline the common case - a known register with a well-formed
+        # payload - in a single loop; anything else falls back to
+        # process_value, which handles logging and unknown types
+        register_handlers = self._register_handlers
+        process_value = self.process_value
+        results = []
+        append = results.append
         
-        H66 sends settings in their actual format - no conversion needed
-        """
-        return value
-    
-    def _process_alarm(self, value: float) -> float:
-        """
-        Process alarm codes
-        0 = no alarm, other values indicate alarm codes
-        Return as float to match InfluxDB field type
-        """
-        return float(value)
-    
-    def _process_runtime(self, value: float) -> float:
-        """
-        Process runtime values (hours)
-        Runtime counters should always be positive
-        """
-        if value < 0:
-            logger.warning(f"Negative runtime value: {value}")
-            return 0.0
+        for register_id, raw_value, register_info in items:
+            handler = register_handlers.get(register_id)
+            if handler is not None and raw_value:
+                try:
+                    append(handler(float(raw_value)))
+                    continue
+                except (ValueError, TypeError):
+                    pass
+            append(process_value(register_id, raw_value, register_info))
         
-        return round(value, 1)
+        return results
     
     def validate_metric(self, register_id: str, value: float) -> bool:
         """
@@ -171,25 +279,8 @@ class MetricsProcessor:
         Returns:
             True if valid, False otherwise
         """
-        register_info = self.config['registers'].get(register_id)
-        
-        if not register_info:
-            return True  # Unknown registers pass through
-        
-        metric_type = register_info.get('type', 'unknown')
-        
-        # Type-specific validation
-        if metric_type == 'temperature':
-            return -50 <= value <= 150
-        elif metric_type == 'status':
-            return True  # All status values are valid
-        elif metric_type == 'power':
-            return 0 <= value <= 50000  # Max 50kW seems reasonable
-        elif metric_type == 'energy':
-            return value >= 0
-        elif metric_type == 'percentage':
-            return 0 <= value <= 100
-        elif metric_type == 'alarm':
-            return value >= 0
+        bounds = self._register_bounds.get(register_id)
+        if bounds is None:
+            return True  # Unknown registers and unbounded types pass through
         
-        return True
+        return bounds[0] <= value <= bounds[1]
@@ -4,12 +4,30 @@ Handles pump-specific register mappings and profiles
 """
 
 import os
+import sys
+import threading
 import yaml
 import logging
 from typing import Dict, Any, Optional
 
+# Prefer libyaml's C parser when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 logger = logging.getLogger(__name__)
 
+# Capability -> logical register name whose presence implies it
+_CAPABILITY_MAP = (
+    ('has_power_measurement', 'power_consumption'),
+    ('has_energy_measurement', 'energy_accumulated'),
+    ('has_heat_carrier_sensors', 'heat_carrier_return'),
+    ('has_separate_heater_steps', 'add_heat_step_1'),
+    ('has_detailed_runtime', 'compressor_runtime_heating'),
+    ('has_external_tank_sensor', 'warm_water_2'),
+)
+
 
 class RegisterManager:
     """
@@ -17,6 +35,14 @@ class RegisterManager:
     to register configurations across different heat pump brands.
     """
     
+    __slots__ = ('pump_type', 'profile_dir', 'registers', 'logical_map', 'capabilities', 'metadata')
+    
+    # Parsed profiles shared by all instances, keyed on (path, mtime, size).
+    # Profiles are only read after loading (interning type names in place is
+    # idempotent), so instances share them.
+    _profile_cache: Dict[tuple, Dict[str, Any]] = {}
+    _profile_cache_lock = threading.Lock()
+    
     def __init__(self, pump_type: str, profile_dir: str = '/app/pump_profiles'):
         """
         Initialize RegisterManager with specific pump type
@@ -32,7 +58,6 @@ class RegisterManager:
         self.capabilities = {}
         
         self._load_profile()
-        self._build_logical_map()
         self._detect_capabilities()
     
     def _load_profile(self):
@@ -46,47 +71,68 @@ class RegisterManager:
             )
         
         try:
-            with open(profile_path, 'r', encoding='utf-8') as f:
-                profile_data = yaml.safe_load(f)
+            profile_data = self._read_profile(profile_path)
             
-            self.registers = profile_data.get('registers', {})
+            # Normalize register IDs to interned uppercase once and build the
+            # logical name map in the same pass. Type names parsed from YAML are fresh
+            # strings; interning them lets type lookups downstream match the
+            # code's literal type names by identity.
+            for register_id, config in profile_data.get('registers', {}).items():
+                register_id = sys.intern(register_id.upper())
+                if isinstance(config.get('type'), str):
+                    config['type'] = sys.intern(config['type'])
+                self.registers[register_id] = config
+                logical_name = config.get('logical_name')
+                if logical_name:
+                    self.logical_map[sys.intern(logical_name)] = register_id
             self.metadata = profile_data.get('metadata', {})
             
-            logger.info(f"Loaded pump profile: {self.pump_type}")
-            logger.info(f"  Brand: {self.metadata.get('brand', 'Unknown')}")
-            logger.info(f"  Model: {self.metadata.get('model', 'Unknown')}")
-            logger.info(f"  Registers: {len(self.registers)}")
+            logger.info("Loaded pump profile: %s", self.pump_type)
+            logger.info("  Brand: %s", self.metadata.get('brand', 'Unknown'))
+            logger.info("  Model: %s", self.metadata.get('model', 'Unknown'))
+            logger.info("  Registers: %d", len(self.registers))
             
         except Exception as e:
-            logger.error(f"Error loading pump profile: {e}")
+            logger.error("Error loading pump profile: %s", e)
             raise
     
-    def _build_logical_map(self):
-        """Build mapping from logical names to register IDs"""
-        for register_id, config in self.registers.items():
-            logical_name = config.get('logical_name')
-            if logical_name:
-                self.logical_map[logical_name] = register_id
+    def _read_profile(self, profile_path: str) -> Dict[str, Any]:
+        """
+        Read a profile YAML, reusing profiles already loaded by another instance
+        
+        Keyed on the file's path, mtime and size, so an edited profile is
+        parsed again.
+        """
+        stat = os.stat(profile_path)
+        memory_key = (os.path.abspath(profile_path), stat.st_mtime, stat.st_size)
+        
+        with RegisterManager._profile_cache_lock:
+            profile_data = RegisterManager._profile_cache.get(memory_key)
+            if profile_data is None:
+                with open(profile_path, 'r', encoding='utf-8') as f:
+                    profile_data = yaml.load(f, Loader=YamlLoader)
+                logger.debug("Parsed %s with %s", profile_path, YamlLoader.__name__)
+                RegisterManager._profile_cache[memory_key] = profile_data
+        
+        return profile_data
     
     def _detect_capabilities(self):
         """Detect what capabilities this pump has"""
+        logical_map = self.logical_map
         self.capabilities = {
-            'has_power_measurement': 'power_consumption' in self.logical_map,
-            'has_energy_measurement': 'energy_accumulated' in self.logical_map,
-            'has_heat_carrier_sensors': 'heat_carrier_return' in self.logical_map,
-            'has_separate_heater_steps': 'add_heat_step_1' in self.logical_map,
-            'has_detailed_runtime': 'compressor_runtime_heating' in self.logical_map,
-            'has_external_tank_sensor': 'warm_water_2' in self.logical_map
+            capability: logical_name in logical_map
+            for capability, logical_name in _CAPABILITY_MAP
         }
         
-        logger.info(f"Pump capabilities detected:")
-        for capability, available in self.capabilities.items():
-            status = "✓" if available else "✗"
-            logger.info(f"  {status} {capability}")
+        logger.debug("Pump capabilities detected: %s", self.capabilities)
     
     def get_register_config(self, register_id: str) -> Optional[Dict[str, Any]]:
-        """Get configuration for a specific register ID"""
-        return self.registers.get(register_id.upper())
+        """
+        Get configuration for a specific register ID
+        
+        Register IDs are stored uppercase; callers pass normalized IDs.
+        """
+        return self.registers.get(register_id)
     
     def get_register_by_logical_name(self, logical_name: str) -> Optional[str]:
         """Get register ID by logical name"""
@@ -125,7 +171,7 @@ class RegisterManager:
         Validate that required registers are available
         
         Args:
-            required_registers: List of logical names or register IDs
+            required_registers: List of logical names or uppercase register IDs
             
         Returns:
             Dict mapping register to availability status
@@ -137,7 +183,7 @@ class RegisterManager:
             if register in self.logical_map:
                 availability[register] = True
             # Then check if it's a register ID
-            elif register.upper() in self.registers:
+            elif register in self.registers:
                 availability[register] = True
             else:
                 availability[register] = False
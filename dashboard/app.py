@@ -31,6 +31,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Dash serialiserar alla callback-svar (figurer, tabeller) via plotly.io.json.
+# Med orjson sker det i C istället för med stdlib json.
+try:
+    import orjson  # noqa: F401
+    import plotly.io as pio
+    pio.json.config.default_engine = 'orjson'
+except ImportError:
+    logger.warning("orjson saknas - callback-svar serialiseras med stdlib json")
+
 
 # Load provider from config
 def load_provider():
@@ -61,7 +70,10 @@ app = Dash(
     __name__,
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     title=provider.get_dashboard_title(),
-    suppress_callback_exceptions=True
+    suppress_callback_exceptions=True,
+    # Gzip för callback-svar - figurernas tidsstämplar och värden
+    # komprimeras väl (kräver flask-compress)
+    compress=True
 )
 
 # Fixa UTF-8 encoding för svenska tecken
@@ -86,8 +98,8 @@ app.index_string = '''
 </html>
 '''
 
-# Initiera datafrågor
-data_query = HeatPumpDataQuery()
+# Initiera datafrågor med samma provider som appen redan laddat
+data_query = HeatPumpDataQuery(provider=provider)
 
 # Sätt layout (passes provider for brand-specific components)
 app.layout = create_layout(provider)
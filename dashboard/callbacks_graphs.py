@@ -4,25 +4,205 @@ Hanterar alla grafer och visualiseringar
 """
 
 import logging
-from dash import Input, Output
+import functools
+from typing import Dict
+from dash import Input, Output, ctx, no_update
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 
+from data_query import DASHBOARD_METRICS
 from config_colors import THERMIA_COLORS, LINE_WIDTH_NORMAL, LINE_WIDTH_THICK, LINE_WIDTH_THIN
 
 logger = logging.getLogger(__name__)
 
+# dcc.Interval i layout.py
+_TICK_SECONDS = 30
+
+# Även långa tidsperioder ritas om helt minst var 10:e minut
+_MAX_REFRESH_TICKS = 20
+
+# id(by_name) -> (by_name, tider i ms), se _times_by_name
+_times_cache = {}
+
+# Sankey-noder: (etiketter, färger)
+# Noder: 0=Mark, 1=Elkraft, 2=Värmepump, 3=Hus, 4=Tillsats (om aktiv)
+_SANKEY_NODES = (
+    ("🌍 Markenergi", "⚡ Elkraft", "🔄 Värmepump", "🏠 Värme till Hus"),
+    ('rgba(0, 212, 255, 0.8)',     # Cyan - Mark (kallt)
+     'rgba(255, 215, 0, 0.8)',     # Gul - Elkraft
+     'rgba(76, 175, 80, 0.8)',     # Grön - Värmepump
+     'rgba(255, 152, 0, 0.8)')     # Orange - Hus (varmt)
+)
+_SANKEY_NODES_AUX = (
+    _SANKEY_NODES[0] + ("🔥 Tillsattsvärme",),
+    _SANKEY_NODES[1] + ('rgba(231, 76, 60, 0.8)',)  # Röd
+)
+
+# Sankey-länkar: (källor, mål, färger)
+# Mark → Värmepump, Elkraft → Värmepump, Värmepump → Hus
+_SANKEY_LINKS = (
+    (0, 1, 2),
+    (2, 2, 3),
+    ('rgba(0, 212, 255, 0.4)', 'rgba(255, 215, 0, 0.4)', 'rgba(255, 152, 0, 0.4)')
+)
+# Som ovan plus Tillsats → Hus före Värmepump → Hus
+_SANKEY_LINKS_AUX = (
+    (0, 1, 4, 2),
+    (2, 2, 3, 3),
+    ('rgba(0, 212, 255, 0.4)', 'rgba(255, 215, 0, 0.4)',
+     'rgba(231, 76, 60, 0.4)', 'rgba(255, 152, 0, 0.4)')
+)
+
+# Fasta delar av Sankey-figuren - bara värden, etiketter och titel
+# ändras mellan uppdateringar
+_SANKEY_NODE_STYLE = {
+    'pad': 20,
+    'thickness': 30,
+    'line': {'color': "white", 'width': 2},
+    'hovertemplate': '%{label}<br>%{customdata}<extra></extra>'
+}
+_SANKEY_LINK_HOVER = '%{source.label} → %{target.label}<br>Energi: %{customdata}<extra></extra>'
+_SANKEY_LAYOUT = {
+    'height': 400,
+    'paper_bgcolor': 'rgba(0,0,0,0)',
+    'plot_bgcolor': 'rgba(0,0,0,0)',
+    'margin': {'l': 10, 'r': 10, 't': 50, 'b': 10},
+    'font': {'size': 11, 'color': "gray"}
+}
+
+# Placeholder for metrics missing from a query result
+_EMPTY = pd.DataFrame(columns=['_time', '_value'])
+
+# Svenska namn för temperaturgrafen
+_TEMP_DISPLAY_NAMES = {
+    'outdoor_temp': 'Ute',
+    'indoor_temp': 'Inne',
+    'hot_water_top': 'Varmvatten',
+    'radiator_forward': 'Radiator Fram ↑',
+    'radiator_return': 'Radiator Retur ↓',
+    'brine_in_evaporator': 'KB In →',
+    'brine_out_condenser': 'KB Ut ←'
+}
+
+# ΔT-kolumner från calculate_cop: (kolumn, legendnamn, färg)
+_DELTA_TRACES = (
+    ('brine_delta', 'KB ΔT', THERMIA_COLORS['delta_brine']),
+    ('radiator_delta', 'Radiator ΔT', THERMIA_COLORS['delta_radiator'])
+)
+
+# Ordning för att lägga till traces (påverkar legend)
+_TEMP_METRIC_ORDER = (
+    'hot_water_top',
+    'radiator_forward',
+    'radiator_return',
+    'indoor_temp',
+    'outdoor_temp',
+    'brine_in_evaporator',
+    'brine_out_condenser'
+)
+
+
+def _epoch_ms(times) -> np.ndarray:
+    """
+    Convert timestamps to epoch milliseconds in one vectorized call
+    
+    Given a datetime Series, Plotly converts it element by element to Python
+    datetime objects and then JSON-encodes each one as an ISO string. An
+    int64 array is serialized directly and is about half the size. Date axes
+    read numbers as UTC milliseconds, the same as the tz-aware timestamps
+    from InfluxDB were displayed. The x axis must be set to type 'date'.
+    """
+    values = times.values if isinstance(times, pd.Series) else times
+    if values.dtype.kind != 'M':
+        # Object-kolumn (strängar eller Timestamp-objekt) - tolka en gång
+        values = pd.to_datetime(values, utc=True).tz_localize(None).values
+    return values.astype('datetime64[ms]').astype(np.int64)
+
+
+def _rounded(values) -> np.ndarray:
+    """
+    Chart values rounded to two decimals
+    
+    aggregateWindow means come back as e.g. 21.533333333333335 - 18 bytes of
+    JSON per point for a value displayed with one or two decimals. Rounding
+    keeps the response text short without changing what is shown.
+    """
+    values = values.to_numpy(dtype=float) if isinstance(values, pd.Series) else values
+    return np.round(values, 2)
+
+
+def _times_by_name(by_name: Dict[str, pd.DataFrame]) -> Dict[str, np.ndarray]:
+    """
+    Epoch-ms timestamps per metric for a shared query_metrics_by_name result
+    
+    The temperature, performance, power and valve graphs get the same cached
+    dict on a tick, so the timestamps are converted once for all of them
+    instead of once per trace. Metrics aggregated into the same windows
+    share a single array.
+    """
+    hit = _times_cache.get(id(by_name))
+    if hit is not None and hit[0] is by_name:
+        return hit[1]
+    
+    times = {}
+    previous_values = previous_ms = None
+    for name, group in by_name.items():
+        values = group['_time'].values
+        if previous_values is None or not np.array_equal(values, previous_values):
+            previous_values, previous_ms = values, _epoch_ms(values)
+        times[name] = previous_ms
+    
+    # Bara de senaste resultaten behövs - ett per tidsperiod
+    if len(_times_cache) >= 8:
+        _times_cache.clear()
+    _times_cache[id(by_name)] = (by_name, times)
+    return times
+
+
+def _is_idle_tick(n, aggregation_seconds: int) -> bool:
+    """
+    True when an interval tick cannot change a graph enough to resend it
+    
+    Graphs are aggregated per window, so only the newest point moves between
+    ticks. Long time ranges are therefore redrawn about twice per window
+    (capped at _MAX_REFRESH_TICKS) instead of resending the whole figure
+    every 30 s. Changing the time range or loading the page always redraws.
+    """
+    if ctx.triggered_id != 'interval-component':
+        return False
+    
+    every = min(max(1, aggregation_seconds // (2 * _TICK_SECONDS)), _MAX_REFRESH_TICKS)
+    return (n or 0) % every != 0
+
 
 def register_graph_callbacks(app, data_query):
     """Registrera alla graf-relaterade callbacks"""
     
+    def per_tick(build_figure):
+        """
+        Skip idle ticks and share the built figure between clients
+        
+        Every open browser fires the same callbacks with the same time
+        range. The first one builds the figure, the others in the same tick
+        reuse it instead of querying and building their own.
+        """
+        @functools.wraps(build_figure)
+        def callback(n, time_range):
+            if _is_idle_tick(n, data_query.get_aggregation_seconds(time_range)):
+                return no_update
+            return data_query.shared((build_figure.__name__, time_range),
+                                     lambda: build_figure(n, time_range))
+        return callback
+    
     # ==================== NYTT: Sankey Energiflödesdiagram ====================
     @app.callback(
         Output('sankey-diagram', 'figure'),
         [Input('interval-component', 'n_intervals'),
          Input('time-range-dropdown', 'value')]
     )
+    @per_tick
     def update_sankey_diagram(n, time_range):
         """
         Uppdatera Sankey energiflödesdiagram
@@ -36,18 +216,15 @@ def register_graph_callbacks(app, data_query):
         try:
             # Hämta COP-data
             cop_df = data_query.calculate_cop(time_range)
+            avg_cop = data_query.get_average_cop(time_range)
             runtime_stats = data_query.calculate_runtime_stats(time_range)
             
-            # Standardvärden om ingen data
-            if cop_df.empty or 'estimated_cop' not in cop_df.columns:
-                avg_cop = 3.0
-                has_data = False
-            else:
-                avg_cop = cop_df['estimated_cop'].mean()
-                has_data = True
+            # Standardvärden om ingen data - en COP-kolumn som bara är NaN
+            # (kompressorn av hela perioden) räknas som data, som tidigare
+            has_data = not cop_df.empty and 'estimated_cop' in cop_df.columns
             
             # Säkerställ rimligt COP-värde
-            if pd.isna(avg_cop) or avg_cop < 1.5 or avg_cop > 6.0:
+            if avg_cop is None or avg_cop < 1.5 or avg_cop > 6.0:
                 avg_cop = 3.0
             
             # Beräkna energiflöden (normaliserade till 100 enheter elkraft)
@@ -66,114 +243,69 @@ def register_graph_callbacks(app, data_query):
             # Beräkna gratis energi från marken
             free_energy_percent = (ground_energy / total_heat * 100) if total_heat > 0 else 0
             
-            # Bygg Sankey-diagram
-            # Noder: 0=Mark, 1=Elkraft, 2=Värmepump, 3=Hus, 4=Tillsats (om aktiv)
-            node_labels = [
-                "🌍 Markenergi",
-                "⚡ Elkraft",
-                "🔄 Värmepump",
-                "🏠 Värme till Hus"
-            ]
-            
-            node_colors = [
-                'rgba(0, 212, 255, 0.8)',    # Cyan - Mark (kallt)
-                'rgba(255, 215, 0, 0.8)',     # Gul - Elkraft
-                'rgba(76, 175, 80, 0.8)',     # Grön - Värmepump
-                'rgba(255, 152, 0, 0.8)'      # Orange - Hus (varmt)
-            ]
-            
-            # Länkar (flöden)
-            sources = []
-            targets = []
-            values = []
-            link_colors = []
-            link_labels = []
-            
-            # Mark → Värmepump
-            sources.append(0)
-            targets.append(2)
-            values.append(ground_energy)
-            link_colors.append('rgba(0, 212, 255, 0.4)')
-            link_labels.append(f'{ground_energy:.0f} ({free_energy_percent:.0f}% gratis)')
-            
-            # Elkraft → Värmepump
-            sources.append(1)
-            targets.append(2)
-            values.append(electric_power)
-            link_colors.append('rgba(255, 215, 0, 0.4)')
-            link_labels.append(f'{electric_power:.0f}')
+            # Bygg Sankey-diagram - noder och länkar är fasta, bara
+            # flödesvärdena och deras etiketter räknas om
+            ground_label = f'{ground_energy:.0f} ({free_energy_percent:.0f}% gratis)'
             
             # Om tillsattsvärme är aktiv
             if aux_heater_power > 5:  # Bara visa om > 5 enheter
-                node_labels.append("🔥 Tillsattsvärme")
-                node_colors.append('rgba(231, 76, 60, 0.8)')  # Röd
-                
-                # Tillsats → Hus
-                sources.append(4)
-                targets.append(3)
-                values.append(aux_heater_power)
-                link_colors.append('rgba(231, 76, 60, 0.4)')
-                link_labels.append(f'{aux_heater_power:.0f}')
+                nodes, links = _SANKEY_NODES_AUX, _SANKEY_LINKS_AUX
                 
                 # Värmepump → Hus (minus tillsats)
                 heat_from_hp = total_heat - aux_heater_power
+                values = [ground_energy, electric_power, aux_heater_power, heat_from_hp]
+                link_labels = [ground_label, f'{electric_power:.0f}',
+                               f'{aux_heater_power:.0f}', f'{heat_from_hp:.0f}']
             else:
+                nodes, links = _SANKEY_NODES, _SANKEY_LINKS
+                
                 heat_from_hp = total_heat
+                values = [ground_energy, electric_power, heat_from_hp]
+                link_labels = [ground_label, f'{electric_power:.0f}', f'{heat_from_hp:.0f}']
             
-            # Värmepump → Hus
-            sources.append(2)
-            targets.append(3)
-            values.append(heat_from_hp)
-            link_colors.append('rgba(255, 152, 0, 0.4)')
-            link_labels.append(f'{heat_from_hp:.0f}')
+            node_labels, node_colors = nodes
+            sources, targets, link_colors = links
             
-            # Skapa Sankey
-            fig = go.Figure(data=[go.Sankey(
-                node=dict(
-                    pad=20,
-                    thickness=30,
-                    line=dict(color="white", width=2),
-                    label=node_labels,
-                    color=node_colors,
-                    customdata=[f"Energi: {v:.0f}" for v in [ground_energy, electric_power, total_heat, total_heat]],
-                    hovertemplate='%{label}<br>%{customdata}<extra></extra>'
-                ),
-                link=dict(
-                    source=sources,
-                    target=targets,
-                    value=values,
-                    color=link_colors,
-                    customdata=link_labels,
-                    hovertemplate='%{source.label} → %{target.label}<br>Energi: %{customdata}<extra></extra>'
-                )
-            )])
-            
-            # Layout
+            # Skapa Sankey - som ren dict, alla egenskaper är kända och
+            # giltiga så go.Sankey/go.Figure-valideringen behövs inte
             title_text = f"Energiflöde (COP: {avg_cop:.2f}, {free_energy_percent:.0f}% gratis från mark)"
             if not has_data:
                 title_text += " - Estimerat (ingen data)"
             
-            fig.update_layout(
-                title=dict(
-                    text=title_text,
-                    font=dict(size=14, color="gray")
-                ),
-                height=400,
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(l=10, r=10, t=50, b=10),
-                font=dict(size=11, color="gray"),
-            )
-            
-            return fig
+            return {
+                'data': [{
+                    'type': 'sankey',
+                    'node': {
+                        **_SANKEY_NODE_STYLE,
+                        'label': node_labels,
+                        'color': node_colors,
+                        'customdata': [f"Energi: {v:.0f}" for v in [ground_energy, electric_power, total_heat, total_heat]]
+                    },
+                    'link': {
+                        'source': sources,
+                        'target': targets,
+                        'value': values,
+                        'color': link_colors,
+                        'customdata': link_labels,
+                        'hovertemplate': _SANKEY_LINK_HOVER
+                    }
+                }],
+                'layout': {
+                    **_SANKEY_LAYOUT,
+                    'title': {
+                        'text': title_text,
+                        'font': {'size': 14, 'color': "gray"}
+                    }
+                }
+            }
             
         except Exception as e:
-            logger.error(f"Error creating Sankey diagram: {e}")
+            logger.error("Error creating Sankey diagram: %s", e)
             # Returnera tom figur vid fel
-            return go.Figure().update_layout(
-                title="Energiflöde - Data ej tillgänglig",
-                height=400
-            )
+            return {
+                'data': [],
+                'layout': {'title': {'text': "Energiflöde - Data ej tillgänglig"}, 'height': 400}
+            }
     
     
     # ==================== COP-graf ====================
@@ -182,6 +314,7 @@ def register_graph_callbacks(app, data_query):
         [Input('interval-component', 'n_intervals'),
          Input('time-range-dropdown', 'value')]
     )
+    @per_tick
     def update_cop_graph(n, time_range):
         """Uppdatera COP-graf"""
         cop_df = data_query.calculate_cop(time_range)
@@ -190,8 +323,8 @@ def register_graph_callbacks(app, data_query):
         
         if not cop_df.empty and 'estimated_cop' in cop_df.columns:
             fig.add_trace(go.Scatter(
-                x=cop_df['_time'],
-                y=cop_df['estimated_cop'],
+                x=_epoch_ms(cop_df['_time']),
+                y=_rounded(cop_df['estimated_cop']),
                 mode='lines',
                 name='COP',
                 line=dict(color=THERMIA_COLORS['cop'], width=LINE_WIDTH_THICK),
@@ -200,17 +333,19 @@ def register_graph_callbacks(app, data_query):
             ))
             
             # Lägg till genomsnittslinje
-            avg_cop = cop_df['estimated_cop'].mean()
-            fig.add_hline(
-                y=avg_cop,
-                line_dash="dash",
-                line_color=THERMIA_COLORS['cop_avg'],
-                annotation_text=f"Medel: {avg_cop:.2f}",
-                annotation_position="right"
-            )
+            avg_cop = data_query.get_average_cop(time_range)
+            if avg_cop is not None:
+                fig.add_hline(
+                    y=avg_cop,
+                    line_dash="dash",
+                    line_color=THERMIA_COLORS['cop_avg'],
+                    annotation_text=f"Medel: {avg_cop:.2f}",
+                    annotation_position="right"
+                )
         
         fig.update_layout(
             xaxis_title="Tid",
+            xaxis_type='date',
             yaxis_title="COP (Värmefaktor)",
             hovermode='x unified',
             height=350,
@@ -229,6 +364,7 @@ def register_graph_callbacks(app, data_query):
         [Input('interval-component', 'n_intervals'),
          Input('time-range-dropdown', 'value')]
     )
+    @per_tick
     def update_runtime_pie(n, time_range):
         """Uppdatera runtime-cirkeldiagram"""
         runtime = data_query.calculate_runtime_stats(time_range)
@@ -241,23 +377,24 @@ def register_graph_callbacks(app, data_query):
         ]
         colors = [THERMIA_COLORS['compressor'], THERMIA_COLORS['aux_heater'], '#e9ecef']
         
-        fig = go.Figure(data=[go.Pie(
-            labels=labels,
-            values=values,
-            hole=0.4,
-            marker=dict(colors=colors),
-            textinfo='label+percent',
-            textposition='outside'
-        )])
-        
-        fig.update_layout(
-            showlegend=False,
-            height=350,
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=20, b=20)
-        )
-        
-        return fig
+        # Ren dict - fasta egenskaper, ingen go.Pie-validering per tick
+        return {
+            'data': [{
+                'type': 'pie',
+                'labels': labels,
+                'values': values,
+                'hole': 0.4,
+                'marker': {'colors': colors},
+                'textinfo': 'label+percent',
+                'textposition': 'outside'
+            }],
+            'layout': {
+                'showlegend': False,
+                'height': 350,
+                'paper_bgcolor': 'rgba(0,0,0,0)',
+                'margin': {'l': 20, 'r': 20, 't': 20, 'b': 20}
+            }
+        }
     
     
     # ==================== Temperaturgraf - FÖRBÄTTRAD FÄRGSÄTTNING ====================
@@ -266,58 +403,28 @@ def register_graph_callbacks(app, data_query):
         [Input('interval-component', 'n_intervals'),
          Input('time-range-dropdown', 'value')]
     )
+    @per_tick
     def update_temperature_graph(n, time_range):
         """Uppdatera temperaturgraf med förbättrad färgsättning"""
-        metrics = [
-            'outdoor_temp',
-            'indoor_temp',
-            'radiator_forward',
-            'radiator_return',
-            'hot_water_top',
-            'brine_in_evaporator',
-            'brine_out_condenser'
-        ]
-        
-        df = data_query.query_metrics(metrics, time_range)
+        by_name = data_query.query_metrics_by_name(DASHBOARD_METRICS, time_range)
+        times = _times_by_name(by_name)
         
         fig = go.Figure()
         
-        # Svenska namn - ordning för legend
-        display_names = {
-            'outdoor_temp': 'Ute',
-            'indoor_temp': 'Inne',
-            'hot_water_top': 'Varmvatten',
-            'radiator_forward': 'Radiator Fram ↑',
-            'radiator_return': 'Radiator Retur ↓',
-            'brine_in_evaporator': 'KB In →',
-            'brine_out_condenser': 'KB Ut ←'
-        }
-        
-        # Ordning för att lägga till traces (påverkar legend)
-        metric_order = [
-            'hot_water_top',
-            'radiator_forward',
-            'radiator_return',
-            'indoor_temp',
-            'outdoor_temp',
-            'brine_in_evaporator',
-            'brine_out_condenser'
-        ]
-        
-        if not df.empty:
-            for name in metric_order:
-                if name in df['name'].unique():
-                    metric_df = df[df['name'] == name]
-                    fig.add_trace(go.Scatter(
-                        x=metric_df['_time'],
-                        y=metric_df['_value'],
-                        mode='lines',
-                        name=display_names.get(name, name),
-                        line=dict(width=LINE_WIDTH_NORMAL, color=THERMIA_COLORS.get(name, '#6c757d'))
-                    ))
+        for name in _TEMP_METRIC_ORDER:
+            metric_df = by_name.get(name)
+            if metric_df is not None:
+                fig.add_trace(go.Scattergl(
+                    x=times[name],
+                    y=_rounded(metric_df['_value']),
+                    mode='lines',
+                    name=_TEMP_DISPLAY_NAMES.get(name, name),
+                    line=dict(width=LINE_WIDTH_NORMAL, color=THERMIA_COLORS.get(name, '#6c757d'))
+                ))
         
         fig.update_layout(
             xaxis_title="Tid",
+            xaxis_type='date',
             yaxis_title="Temperatur (°C)",
             hovermode='x unified',
             legend=dict(
@@ -343,17 +450,11 @@ def register_graph_callbacks(app, data_query):
         [Input('interval-component', 'n_intervals'),
          Input('time-range-dropdown', 'value')]
     )
+    @per_tick
     def update_performance_graph(n, time_range):
         """Uppdatera systemprestandagraf med förbättrad färgsättning"""
-        metrics = [
-            'brine_in_evaporator',
-            'brine_out_condenser',
-            'radiator_forward',
-            'radiator_return',
-            'compressor_status'
-        ]
-        
-        df = data_query.query_metrics(metrics, time_range)
+        by_name = data_query.query_metrics_by_name(DASHBOARD_METRICS, time_range)
+        times = _times_by_name(by_name)
         
         fig = make_subplots(
             rows=2, cols=1,
@@ -362,58 +463,33 @@ def register_graph_callbacks(app, data_query):
             row_heights=[0.6, 0.4]
         )
         
-        if not df.empty:
-            brine_in = df[df['name'] == 'brine_in_evaporator']
-            brine_out = df[df['name'] == 'brine_out_condenser']
-            rad_forward = df[df['name'] == 'radiator_forward']
-            rad_return = df[df['name'] == 'radiator_return']
-            
-            if not brine_in.empty and not brine_out.empty:
-                brine_delta = pd.merge(
-                    brine_in[['_time', '_value']],
-                    brine_out[['_time', '_value']],
-                    on='_time',
-                    suffixes=('_in', '_out')
-                )
-                brine_delta['delta'] = brine_delta['_value_in'] - brine_delta['_value_out']
-                
-                fig.add_trace(
-                    go.Scatter(
-                        x=brine_delta['_time'],
-                        y=brine_delta['delta'],
-                        mode='lines',
-                        name='KB ΔT',
-                        line=dict(color=THERMIA_COLORS['delta_brine'], width=LINE_WIDTH_NORMAL)
-                    ),
-                    row=1, col=1
-                )
-            
-            if not rad_forward.empty and not rad_return.empty:
-                rad_delta = pd.merge(
-                    rad_forward[['_time', '_value']],
-                    rad_return[['_time', '_value']],
-                    on='_time',
-                    suffixes=('_fwd', '_ret')
-                )
-                rad_delta['delta'] = rad_delta['_value_fwd'] - rad_delta['_value_ret']
-                
-                fig.add_trace(
-                    go.Scatter(
-                        x=rad_delta['_time'],
-                        y=rad_delta['delta'],
-                        mode='lines',
-                        name='Radiator ΔT',
-                        line=dict(color=THERMIA_COLORS['delta_radiator'], width=LINE_WIDTH_NORMAL)
-                    ),
-                    row=1, col=1
-                )
+        if by_name:
+            # ΔT räknas ut i InfluxDB av calculate_cop (redan cachad för
+            # COP-grafen) - bara tidpunkter där båda givarna finns har ett värde
+            cop_df = data_query.calculate_cop(time_range)
+            if not cop_df.empty:
+                cop_times = _epoch_ms(cop_df['_time'])
+                for column, label, color in _DELTA_TRACES:
+                    if column not in cop_df.columns:
+                        continue
+                    valid = cop_df[column].notna().to_numpy()
+                    fig.add_trace(
+                        go.Scattergl(
+                            x=cop_times[valid],
+                            y=_rounded(cop_df[column].to_numpy(dtype=float)[valid]),
+                            mode='lines',
+                            name=label,
+                            line=dict(color=color, width=LINE_WIDTH_NORMAL)
+                        ),
+                        row=1, col=1
+                    )
             
-            comp = df[df['name'] == 'compressor_status']
+            comp = by_name.get('compressor_status', _EMPTY)
             if not comp.empty:
                 fig.add_trace(
-                    go.Scatter(
-                        x=comp['_time'],
-                        y=comp['_value'],
+                    go.Scattergl(
+                        x=times['compressor_status'],
+                        y=_rounded(comp['_value']),
                         mode='lines',
                         name='Kompressor',
                         fill='tozeroy',
@@ -423,6 +499,7 @@ def register_graph_callbacks(app, data_query):
                     row=2, col=1
                 )
         
+        fig.update_xaxes(type='date')
         fig.update_xaxes(title_text="Tid", row=2, col=1)
         fig.update_yaxes(title_text="ΔT (°C)", row=1, col=1)
         fig.update_yaxes(title_text="Status", row=2, col=1)
@@ -444,15 +521,11 @@ def register_graph_callbacks(app, data_query):
         [Input('interval-component', 'n_intervals'),
          Input('time-range-dropdown', 'value')]
     )
+    @per_tick
     def update_power_graph(n, time_range):
         """Uppdatera effektförbrukningsgraf med förbättrad färgsättning"""
-        metrics = [
-            'power_consumption',
-            'compressor_status',
-            'additional_heat_percent'
-        ]
-        
-        df = data_query.query_metrics(metrics, time_range)
+        by_name = data_query.query_metrics_by_name(DASHBOARD_METRICS, time_range)
+        times = _times_by_name(by_name)
         
         fig = make_subplots(
             rows=2, cols=1,
@@ -461,13 +534,13 @@ def register_graph_callbacks(app, data_query):
             specs=[[{"secondary_y": False}], [{"secondary_y": False}]]
         )
         
-        if not df.empty:
-            power = df[df['name'] == 'power_consumption']
+        if by_name:
+            power = by_name.get('power_consumption', _EMPTY)
             if not power.empty:
                 fig.add_trace(
-                    go.Scatter(
-                        x=power['_time'],
-                        y=power['_value'],
+                    go.Scattergl(
+                        x=times['power_consumption'],
+                        y=_rounded(power['_value']),
                         mode='lines',
                         name='Effekt',
                         line=dict(color=THERMIA_COLORS['power'], width=LINE_WIDTH_NORMAL),
@@ -477,12 +550,12 @@ def register_graph_callbacks(app, data_query):
                     row=1, col=1
                 )
             
-            comp = df[df['name'] == 'compressor_status']
+            comp = by_name.get('compressor_status', _EMPTY)
             if not comp.empty:
                 fig.add_trace(
-                    go.Scatter(
-                        x=comp['_time'],
-                        y=comp['_value'],
+                    go.Scattergl(
+                        x=times['compressor_status'],
+                        y=_rounded(comp['_value']),
                         mode='lines',
                         name='Kompressor',
                         line=dict(color=THERMIA_COLORS['compressor'], width=LINE_WIDTH_NORMAL)
@@ -490,12 +563,12 @@ def register_graph_callbacks(app, data_query):
                     row=2, col=1
                 )
             
-            heater = df[df['name'] == 'additional_heat_percent']
+            heater = by_name.get('additional_heat_percent', _EMPTY)
             if not heater.empty:
                 fig.add_trace(
-                    go.Scatter(
-                        x=heater['_time'],
-                        y=heater['_value'],
+                    go.Scattergl(
+                        x=times['additional_heat_percent'],
+                        y=_rounded(heater['_value']),
                         mode='lines',
                         name='Tillsats %',
                         line=dict(color=THERMIA_COLORS['aux_heater'], width=LINE_WIDTH_NORMAL)
@@ -503,6 +576,7 @@ def register_graph_callbacks(app, data_query):
                     row=2, col=1
                 )
         
+        fig.update_xaxes(type='date')
         fig.update_xaxes(title_text="Tid", row=2, col=1)
         fig.update_yaxes(title_text="Effekt (W)", row=1, col=1)
         fig.update_yaxes(title_text="Status / %", row=2, col=1)
@@ -524,6 +598,7 @@ def register_graph_callbacks(app, data_query):
         [Input('interval-component', 'n_intervals'),
          Input('time-range-dropdown', 'value')]
     )
+    @per_tick
     def update_valve_status_graph(n, time_range):
         """
         Uppdatera växelventilsstatusgraf för att analysera varmvattenproduktion
@@ -533,13 +608,8 @@ def register_graph_callbacks(app, data_query):
         - Kompressorstatus (för att se aktiv produktion)
         - Varmvattentemperatur (för att se temperaturökning)
         """
-        metrics = [
-            'switch_valve_status',      # Växelventil
-            'compressor_status',         # Kompressor
-            'hot_water_top'             # Varmvattentemperatur
-        ]
-        
-        df = data_query.query_metrics(metrics, time_range)
+        by_name = data_query.query_metrics_by_name(DASHBOARD_METRICS, time_range)
+        times = _times_by_name(by_name)
         
         fig = make_subplots(
             rows=3, cols=1,
@@ -552,14 +622,14 @@ def register_graph_callbacks(app, data_query):
             specs=[[{"secondary_y": False}], [{"secondary_y": False}], [{"secondary_y": False}]]
         )
         
-        if not df.empty:
+        if by_name:
             # Växelventil
-            valve = df[df['name'] == 'switch_valve_status']
+            valve = by_name.get('switch_valve_status', _EMPTY)
             if not valve.empty:
                 fig.add_trace(
-                    go.Scatter(
-                        x=valve['_time'],
-                        y=valve['_value'],
+                    go.Scattergl(
+                        x=times['switch_valve_status'],
+                        y=_rounded(valve['_value']),
                         mode='lines',
                         name='Växelventil',
                         line=dict(color='#ff9800', width=3),  # Orange
@@ -570,12 +640,12 @@ def register_graph_callbacks(app, data_query):
                 )
             
             # Kompressor
-            comp = df[df['name'] == 'compressor_status']
+            comp = by_name.get('compressor_status', _EMPTY)
             if not comp.empty:
                 fig.add_trace(
-                    go.Scatter(
-                        x=comp['_time'],
-                        y=comp['_value'],
+                    go.Scattergl(
+                        x=times['compressor_status'],
+                        y=_rounded(comp['_value']),
                         mode='lines',
                         name='Kompressor',
                         line=dict(color=THERMIA_COLORS['compressor'], width=LINE_WIDTH_NORMAL),
@@ -586,12 +656,12 @@ def register_graph_callbacks(app, data_query):
                 )
             
             # Varmvattentemperatur
-            hw_temp = df[df['name'] == 'hot_water_top']
+            hw_temp = by_name.get('hot_water_top', _EMPTY)
             if not hw_temp.empty:
                 fig.add_trace(
-                    go.Scatter(
-                        x=hw_temp['_time'],
-                        y=hw_temp['_value'],
+                    go.Scattergl(
+                        x=times['hot_water_top'],
+                        y=_rounded(hw_temp['_value']),
                         mode='lines',
                         name='VV Temp',
                         line=dict(color=THERMIA_COLORS['hot_water_top'], width=LINE_WIDTH_NORMAL)
@@ -600,6 +670,7 @@ def register_graph_callbacks(app, data_query):
                 )
         
         # Uppdatera axlar
+        fig.update_xaxes(type='date')
         fig.update_xaxes(title_text="Tid", row=3, col=1)
         fig.update_yaxes(title_text="Status", row=1, col=1, range=[-0.1, 1.1])
         fig.update_yaxes(title_text="Status", row=2, col=1, range=[-0.1, 1.1])
@@ -31,9 +31,8 @@ def register_kpi_callbacks(app, data_query):
         """Uppdatera KPI-kort"""
         
         # Beräkna COP
-        cop_df = data_query.calculate_cop(time_range)
-        if not cop_df.empty and 'estimated_cop' in cop_df.columns:
-            avg_cop = cop_df['estimated_cop'].mean()
+        avg_cop = data_query.get_average_cop(time_range)
+        if avg_cop is not None:
             cop_display = f"{avg_cop:.2f}"
         else:
             cop_display = "--"
@@ -328,9 +327,8 @@ def register_kpi_callbacks(app, data_query):
         hotwater_str = f"{hotwater:.1f}°C" if hotwater is not None else "--°C"
 
         # COP
-        cop_df = data_query.calculate_cop(time_range)
-        if not cop_df.empty and 'estimated_cop' in cop_df.columns:
-            avg_cop = cop_df['estimated_cop'].mean()
+        avg_cop = data_query.get_average_cop(time_range)
+        if avg_cop is not None:
             cop_str = f"{avg_cop:.2f}"
         else:
             cop_str = "--"
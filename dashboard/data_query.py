@@ -13,10 +13,14 @@ FEATURES:
 
 import os
 import sys
+import time
+import functools
 import logging
+import threading
 import warnings
 import yaml
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
 import pandas as pd
 import numpy as np
 from influxdb_client import InfluxDBClient
@@ -32,12 +36,121 @@ warnings.simplefilter("ignore", MissingPivotFunction)
 
 logger = logging.getLogger(__name__)
 
+# Max antal InfluxDB-frågor som körs parallellt inom ett anrop
+QUERY_WORKERS = 6
+
+# Hur länge ett frågeresultat återanvänds (sekunder). Kortare än dashboardens
+# 30 s uppdateringsintervall: varje tick hämtar ny data, men alla callbacks
+# som körs under samma tick delar på samma InfluxDB-frågor.
+QUERY_CACHE_TTL_SECONDS = 25
+
+# Tomma resultat (natt, avbrott i insamlingen) behålls längre så att varje
+# tick inte frågar InfluxDB igen i onödan
+EMPTY_CACHE_TTL_SECONDS = 60
+
+# Tidsserier som graferna och körtids-/energiberäkningarna använder. Alla
+# hämtas med samma fråga per tidsperiod (query_metrics_by_name), så en
+# uppdatering kostar en InfluxDB-fråga istället för en per graf
+DASHBOARD_METRICS = (
+    'outdoor_temp',
+    'indoor_temp',
+    'radiator_forward',
+    'radiator_return',
+    'hot_water_top',
+    'brine_in_evaporator',
+    'brine_out_condenser',
+    'compressor_status',
+    'power_consumption',
+    'additional_heat_percent',
+    'switch_valve_status'
+)
+
+# Metrics för COP-beräkningen och dess färdiga Flux-filter
+_COP_METRICS = (
+    'radiator_forward',
+    'radiator_return',
+    'brine_in_evaporator',
+    'brine_out_condenser',
+    'power_consumption',
+    'compressor_status'
+)
+_COP_NAME_FILTER = ' or '.join(f'r.name == "{name}"' for name in _COP_METRICS)
+
+_HOT_WATER_METRICS = ('switch_valve_status', 'hot_water_top', 'power_consumption')
+
+# Statusändringar som visas i händelseloggen
+_EVENT_METRICS = (
+    'compressor_status',
+    'brine_pump_status',
+    'radiator_pump_status',
+    'switch_valve_status',
+    'additional_heat_percent',
+    'alarm_code'
+)
+
+
+def split_by_name(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Split a long-format query result into one frame per metric name
+    
+    One groupby pass replaces a full df[df['name'] == metric] scan and copy
+    per metric. Metrics without data are simply missing from the dict.
+    
+    Values are stored as float32 - plenty for °C, W, % and 0/1 status, and
+    half the memory for the split frames kept in the query cache.
+    """
+    if df.empty:
+        return {}
+    if df['_value'].dtype == np.float64:
+        df = df.astype({'_value': np.float32})
+    return {name: group for name, group in df.groupby('name', sort=False)}
+
+
+def _memoized(method: Callable) -> Callable:
+    """
+    Share a HeatPumpDataQuery method's result per arguments within one tick
+    
+    The callbacks of every open browser ask for the same calculations on
+    each interval tick. With this decorator they get one result through
+    _cached, which must be treated as read-only.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        return self._cached(key, lambda: method(self, *args, **kwargs))
+    return wrapper
+
+
+def active_seconds(df: pd.DataFrame) -> float:
+    """
+    Sum the time a status/percent metric was above zero
+    
+    Each sample counts until the next sample; the last one is assumed to
+    last as long as the interval before it. Computed on numpy arrays in one
+    pass instead of an iloc lookup per row.
+    """
+    if len(df) < 2:
+        return 0.0
+    
+    df = df.sort_values('_time')
+    seconds = np.diff(df['_time'].values).astype('timedelta64[ns]').astype(np.int64) / 1e9
+    active = df['_value'].to_numpy(dtype=float) > 0
+    
+    # Intervallet efter sista punkten antas vara lika långt som det före
+    return float(seconds[active[:-1]].sum() + (seconds[-1] if active[-1] else 0.0))
+
 
 class HeatPumpDataQuery:
     """Query data from InfluxDB with advanced calculations"""
 
-    def __init__(self, config_path: str = '/app/config.yaml'):
-        """Initialize InfluxDB client and load provider"""
+    def __init__(self, config_path: str = '/app/config.yaml', provider=None):
+        """
+        Initialize InfluxDB client and load provider
+        
+        Args:
+            config_path: Config file used to pick the provider
+            provider: Already loaded provider - skips reading the config again
+        """
         self.url = os.getenv('INFLUXDB_URL', 'http://influxdb:8086')
         self.token = os.getenv('INFLUXDB_TOKEN')
         self.org = os.getenv('INFLUXDB_ORG', 'thermia')
@@ -45,11 +158,20 @@ class HeatPumpDataQuery:
         self.client = InfluxDBClient(url=self.url, token=self.token, org=self.org)
         self.query_api = self.client.query_api()
 
-        # Load provider based on config
-        self.provider = self._load_provider(config_path)
+        # Result cache shared by all callbacks: key -> (monotonic expiry, result)
+        self._cache: Dict[Any, Any] = {}
+        self._cache_locks: Dict[Any, threading.Lock] = {}
+        self._cache_lock = threading.Lock()
+
+        # Independent queries within one call run concurrently - the time is
+        # spent waiting on InfluxDB, not in Python
+        self._executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix='influx-query')
+
+        # Load provider based on config (unless the app already has one)
+        self.provider = provider if provider is not None else self._load_provider(config_path)
         self.alarm_codes = self.provider.get_alarm_codes()
         self.alarm_register_id = self.provider.get_alarm_register_id()
-        logger.info(f"Data query initialized for {self.provider.get_display_name()}")
+        logger.info("Data query initialized for %s", self.provider.get_display_name())
 
     def _load_provider(self, config_path: str):
         """Load provider from config"""
@@ -63,10 +185,59 @@ class HeatPumpDataQuery:
 
             return get_provider(brand)
         except Exception as e:
-            logger.warning(f"Failed to load provider from config: {e}, defaulting to Thermia")
+            logger.warning("Failed to load provider from config: %s, defaulting to Thermia", e)
             from providers.thermia.provider import ThermiaProvider
             return ThermiaProvider()
     
+    def _cached(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for key, computing it at most once per TTL
+        
+        Dash fires all interval callbacks at the same time and many of them
+        ask for the same data. Concurrent callers for the same key wait on a
+        per-key lock for the first one's result instead of all querying
+        InfluxDB. Empty results are kept for EMPTY_CACHE_TTL_SECONDS.
+        Exceptions from compute are not cached.
+        """
+        with self._cache_lock:
+            key_lock = self._cache_locks.get(key)
+            if key_lock is None:
+                key_lock = self._cache_locks[key] = threading.Lock()
+        
+        with key_lock:
+            hit = self._cache.get(key)
+            if hit is not None and time.monotonic() < hit[0]:
+                return hit[1]
+            
+            result = compute()
+            empty = hasattr(result, '__len__') and len(result) == 0
+            ttl = EMPTY_CACHE_TTL_SECONDS if empty else QUERY_CACHE_TTL_SECONDS
+            self._cache[key] = (time.monotonic() + ttl, result)
+            return result
+    
+    def shared(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Share a result derived from query data between callbacks and clients
+        
+        Same TTL cache as the queries; used for e.g. finished figures, which
+        are identical for every browser showing the same time range.
+        """
+        return self._cached(('shared', key), compute)
+    
+    def _query_data_frame(self, query: str) -> pd.DataFrame:
+        """
+        Run a Flux query and return a single DataFrame, cached per query text
+        
+        Callers must treat the returned frame as read-only since it is shared.
+        """
+        def run_query() -> pd.DataFrame:
+            result = self.query_api.query_data_frame(query)
+            if isinstance(result, list):
+                result = pd.concat(result, ignore_index=True)
+            return result
+        
+        return self._cached(query, run_query)
+    
     def _get_aggregation_window(self, time_range: str) -> str:
         """
         NYTT: Dynamisk aggregering baserat på tidsperiod
@@ -97,6 +268,11 @@ class HeatPumpDataQuery:
         else:
             return "5m"  # Default
     
+    def get_aggregation_seconds(self, time_range: str) -> int:
+        """Length of the aggregation window for time_range, in seconds"""
+        window = self._get_aggregation_window(time_range)
+        return int(window[:-1]) * (3600 if window.endswith('h') else 60)
+    
     def query_metrics(self, metric_names: List[str], time_range: str = '24h', 
                      aggregation_window: Optional[str] = None) -> pd.DataFrame:
         """
@@ -110,36 +286,58 @@ class HeatPumpDataQuery:
             aggregation_window: Specifikt aggregeringsfönster (None = automatisk)
         """
         try:
-            name_filter = ' or '.join([f'r.name == "{name}"' for name in metric_names])
-            
-            # Använd angiven aggregering eller beräkna automatiskt
-            if aggregation_window is None:
-                aggregation_window = self._get_aggregation_window(time_range)
-            
-            query = f'''
-                from(bucket: "{self.bucket}")
-                    |> range(start: -{time_range})
-                    |> filter(fn: (r) => r._measurement == "heatpump")
-                    |> filter(fn: (r) => {name_filter})
-                    |> aggregateWindow(every: {aggregation_window}, fn: mean, createEmpty: false)
-                    |> yield(name: "mean")
-            '''
-            
-            logger.debug(f"Querying metrics with {aggregation_window} aggregation for {time_range}")
-            
-            result = self.query_api.query_data_frame(query)
-            
-            if isinstance(result, list):
-                result = pd.concat(result, ignore_index=True)
-            
-            return result
+            query = self._build_metrics_query(metric_names, time_range, aggregation_window)
+            return self._query_data_frame(query)
             
         except Exception as e:
-            logger.error(f"Error querying metrics: {e}")
+            logger.error("Error querying metrics: %s", e)
             return pd.DataFrame()
     
+    def query_metrics_by_name(self, metric_names: List[str], time_range: str = '24h',
+                              aggregation_window: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Query metrics and split the result into one frame per metric name
+        
+        The split is cached together with the query, so callbacks asking for
+        the same metric set share both the InfluxDB round trip and the groupby.
+        """
+        try:
+            query = self._build_metrics_query(metric_names, time_range, aggregation_window)
+            return self._cached(('by_name', query), lambda: split_by_name(self._query_data_frame(query)))
+            
+        except Exception as e:
+            logger.error("Error querying metrics: %s", e)
+            return {}
+    
+    def _build_metrics_query(self, metric_names: List[str], time_range: str,
+                             aggregation_window: Optional[str]) -> str:
+        """Build the aggregateWindow query used by query_metrics"""
+        name_filter = ' or '.join([f'r.name == "{name}"' for name in metric_names])
+        
+        # Använd angiven aggregering eller beräkna automatiskt
+        if aggregation_window is None:
+            aggregation_window = self._get_aggregation_window(time_range)
+        
+        logger.debug("Querying metrics with %s aggregation for %s", aggregation_window, time_range)
+        
+        return f'''
+            from(bucket: "{self.bucket}")
+                |> range(start: -{time_range})
+                |> filter(fn: (r) => r._measurement == "heatpump")
+                |> filter(fn: (r) => {name_filter})
+                |> aggregateWindow(every: {aggregation_window}, fn: mean, createEmpty: false)
+                |> keep(columns: ["_time", "_value", "name"])
+                |> yield(name: "mean")
+        '''
+    
     def get_latest_values(self) -> Dict[str, Any]:
-        """Get latest values for all metrics"""
+        """
+        Get latest values for all metrics
+        
+        Nearly every status, KPI and brand callback calls this on each tick,
+        so the dict itself is cached along with the query. Callers must not
+        modify it.
+        """
         try:
             query = f'''
                 from(bucket: "{self.bucket}")
@@ -148,26 +346,29 @@ class HeatPumpDataQuery:
                     |> last()
             '''
             
-            result = self.query_api.query_data_frame(query)
-            
-            if isinstance(result, list):
-                result = pd.concat(result, ignore_index=True)
-            
-            latest = {}
-            if not result.empty:
-                for _, row in result.iterrows():
-                    latest[row['name']] = {
-                        'value': row['_value'],
-                        'unit': row.get('unit', ''),
-                        'time': row['_time']
-                    }
-            
-            return latest
+            def build_latest() -> Dict[str, Any]:
+                result = self._query_data_frame(query)
+                
+                latest = {}
+                if not result.empty:
+                    # Iterera över kolumnerna direkt - iterrows() bygger en Series per rad
+                    units = result['unit'] if 'unit' in result.columns else [''] * len(result)
+                    for name, value, unit, timestamp in zip(result['name'], result['_value'].tolist(),
+                                                            units, result['_time']):
+                        latest[name] = {
+                            'value': value,
+                            'unit': unit,
+                            'time': timestamp
+                        }
+                return latest
+            
+            return self._cached(('latest', query), build_latest)
             
         except Exception as e:
-            logger.error(f"Error getting latest values: {e}")
+            logger.error("Error getting latest values: %s", e)
             return {}
     
+    @_memoized
     def get_min_max_values(self, time_range: str = '24h') -> Dict[str, Dict[str, float]]:
         """Get MIN and MAX values for all metrics over the specified time range"""
         try:
@@ -187,94 +388,107 @@ class HeatPumpDataQuery:
                     |> max()
             '''
             
-            result_min = self.query_api.query_data_frame(query_min)
-            result_max = self.query_api.query_data_frame(query_max)
-            
-            if isinstance(result_min, list):
-                result_min = pd.concat(result_min, ignore_index=True)
-            if isinstance(result_max, list):
-                result_max = pd.concat(result_max, ignore_index=True)
+            result_min, result_max = self._executor.map(self._query_data_frame, (query_min, query_max))
             
             min_max = {}
             
             if not result_min.empty:
-                for _, row in result_min.iterrows():
-                    metric_name = row['name']
-                    if metric_name not in min_max:
-                        min_max[metric_name] = {}
-                    min_max[metric_name]['min'] = row['_value']
+                for metric_name, value in zip(result_min['name'], result_min['_value'].tolist()):
+                    min_max.setdefault(metric_name, {})['min'] = value
             
             if not result_max.empty:
-                for _, row in result_max.iterrows():
-                    metric_name = row['name']
-                    if metric_name not in min_max:
-                        min_max[metric_name] = {}
-                    min_max[metric_name]['max'] = row['_value']
+                for metric_name, value in zip(result_max['name'], result_max['_value'].tolist()):
+                    min_max.setdefault(metric_name, {})['max'] = value
             
             return min_max
             
         except Exception as e:
-            logger.error(f"Error getting min/max values: {e}")
+            logger.error("Error getting min/max values: %s", e)
             return {}
     
+    @_memoized
     def calculate_cop(self, time_range: str = '24h') -> pd.DataFrame:
         """
         Calculate COP (Coefficient of Performance) over time
         
         COP = Heat Output / Electrical Input
         Simplified calculation using temperature deltas
+        
+        Cached per time range - the COP graph, KPI cards, top bar and Sankey
+        diagram all use it on the same tick. The returned frame is shared
+        and must be treated as read-only.
         """
         try:
-            metrics = [
-                'radiator_forward',
-                'radiator_return',
-                'brine_in_evaporator',
-                'brine_out_condenser',
-                'power_consumption',
-                'compressor_status'
-            ]
+            aggregation_window = self._get_aggregation_window(time_range)
+            
+            # Pivot och temperaturdifferenser beräknas i InfluxDB - bara
+            # en rad per tidpunkt skickas tillbaka istället för en per metric
+            query = f'''
+                from(bucket: "{self.bucket}")
+                    |> range(start: -{time_range})
+                    |> filter(fn: (r) => r._measurement == "heatpump")
+                    |> filter(fn: (r) => {_COP_NAME_FILTER})
+                    |> aggregateWindow(every: {aggregation_window}, fn: mean, createEmpty: false)
+                    |> keep(columns: ["_time", "_value", "name"])
+                    |> group()
+                    |> pivot(rowKey: ["_time"], columnKey: ["name"], valueColumn: "_value")
+                    |> map(fn: (r) => ({{r with
+                        radiator_delta: r.radiator_forward - r.radiator_return,
+                        brine_delta: r.brine_in_evaporator - r.brine_out_condenser
+                    }}))
+                    |> sort(columns: ["_time"])
+            '''
             
-            df = self.query_metrics(metrics, time_range)
+            df = self._query_data_frame(query)
             
             if df.empty:
                 return pd.DataFrame()
             
-            # Pivot to get each metric as a column
-            df_pivot = df.pivot_table(
-                index='_time',
-                columns='name',
-                values='_value',
-                aggfunc='mean'
-            ).reset_index()
-            
-            # Calculate temperature deltas
-            if 'radiator_forward' in df_pivot.columns and 'radiator_return' in df_pivot.columns:
-                df_pivot['radiator_delta'] = df_pivot['radiator_forward'] - df_pivot['radiator_return']
+            # Metrics saknas helt -> deras delta-kolumn är bara null. Ta bort
+            # dem så att kolumnkontrollerna nedan fungerar som tidigare.
+            # dropna() ger dessutom en egen kopia av den cachade frågan.
+            df_pivot = df.dropna(axis=1, how='all')
             
-            if 'brine_in_evaporator' in df_pivot.columns and 'brine_out_condenser' in df_pivot.columns:
-                df_pivot['brine_delta'] = df_pivot['brine_in_evaporator'] - df_pivot['brine_out_condenser']
-            
-            # Simplified COP calculation
+            # Simplified COP calculation - on the numpy columns, NaN where
+            # the compressor is off or a delta is missing/too small
             if 'radiator_delta' in df_pivot.columns and 'brine_delta' in df_pivot.columns:
-                mask = (
-                    (df_pivot.get('compressor_status', 0) > 0) &
-                    (df_pivot['brine_delta'] > 0.5) &
-                    (df_pivot['radiator_delta'] > 0.5)
-                )
+                radiator_delta = df_pivot['radiator_delta'].to_numpy(dtype=float)
+                brine_delta = df_pivot['brine_delta'].to_numpy(dtype=float)
                 
-                df_pivot.loc[mask, 'estimated_cop'] = 2.0 + (
-                    df_pivot.loc[mask, 'radiator_delta'] / df_pivot.loc[mask, 'brine_delta']
-                )
+                mask = (brine_delta > 0.5) & (radiator_delta > 0.5)
+                if 'compressor_status' in df_pivot.columns:
+                    mask &= df_pivot['compressor_status'].to_numpy(dtype=float) > 0
+                else:
+                    mask[:] = False
                 
+                estimated_cop = np.full(len(df_pivot), np.nan)
                 # Clamp to reasonable values (1.5 - 6.0)
-                df_pivot['estimated_cop'] = df_pivot['estimated_cop'].clip(1.5, 6.0)
+                estimated_cop[mask] = np.clip(2.0 + radiator_delta[mask] / brine_delta[mask], 1.5, 6.0)
+                df_pivot['estimated_cop'] = estimated_cop
             
             return df_pivot
             
         except Exception as e:
-            logger.error(f"Error calculating COP: {e}")
+            logger.error("Error calculating COP: %s", e)
             return pd.DataFrame()
     
+    @_memoized
+    def get_average_cop(self, time_range: str = '24h') -> Optional[float]:
+        """
+        Mean estimated COP over the time range, or None without COP data
+        
+        Shown by the KPI card, top bar, COP graph and Sankey diagram; the
+        mean is taken once on the numpy column instead of once per caller.
+        """
+        cop_df = self.calculate_cop(time_range)
+        if cop_df.empty or 'estimated_cop' not in cop_df.columns:
+            return None
+        
+        cop = cop_df['estimated_cop'].to_numpy(dtype=float)
+        cop = cop[~np.isnan(cop)]
+        return float(cop.mean()) if cop.size else None
+    
+    @_memoized
     def calculate_energy_costs(self, time_range: str = '24h', price_per_kwh: float = 2.0) -> Dict[str, Any]:
         """
         Calculate energy consumption and costs
@@ -282,9 +496,9 @@ class HeatPumpDataQuery:
         KORREKT: Använder verklig tid mellan datapunkter
         """
         try:
-            df = self.query_metrics(['power_consumption'], time_range)
+            df = self.query_metrics_by_name(DASHBOARD_METRICS, time_range).get('power_consumption')
             
-            if df.empty:
+            if df is None:
                 return {
                     'total_kwh': 0,
                     'total_cost': 0,
@@ -301,10 +515,11 @@ class HeatPumpDataQuery:
             # Energy = Power (W) * Time (h) / 1000 (to get kWh)
             df['energy_kwh'] = (df['_value'] * df['time_diff_hours']) / 1000
             
-            total_kwh = df['energy_kwh'].sum()
+            # _value är float32 (split_by_name) - summera/returnera som float
+            total_kwh = float(df['energy_kwh'].sum())
             total_cost = total_kwh * price_per_kwh
-            avg_power = df['_value'].mean()
-            peak_power = df['_value'].max()
+            avg_power = float(df['_value'].mean())
+            peak_power = float(df['_value'].max())
             
             return {
                 'total_kwh': round(total_kwh, 2),
@@ -314,7 +529,7 @@ class HeatPumpDataQuery:
             }
             
         except Exception as e:
-            logger.error(f"Error calculating energy costs: {e}")
+            logger.error("Error calculating energy costs: %s", e)
             return {
                 'total_kwh': 0,
                 'total_cost': 0,
@@ -322,17 +537,22 @@ class HeatPumpDataQuery:
                 'peak_power': 0
             }
     
+    @_memoized
     def calculate_runtime_stats(self, time_range: str = '24h') -> Dict[str, Any]:
         """
         Calculate runtime statistics for compressor and auxiliary heater
         
         KORREKT: Använder verklig tid mellan datapunkter
+        
+        Cached per time range - used by the KPI cards, the runtime pie and
+        the Sankey diagram on the same tick.
         """
         try:
-            metrics = ['compressor_status', 'additional_heat_percent']
-            df = self.query_metrics(metrics, time_range)
+            by_name = self.query_metrics_by_name(DASHBOARD_METRICS, time_range)
+            frames = [by_name[name] for name in ('compressor_status', 'additional_heat_percent')
+                      if name in by_name]
             
-            if df.empty:
+            if not frames:
                 return {
                     'compressor_runtime_hours': 0,
                     'compressor_runtime_percent': 0,
@@ -341,10 +561,10 @@ class HeatPumpDataQuery:
                     'total_hours': 0
                 }
             
-            df = df.sort_values('_time')
-            
             # Beräkna total tidsperiod
-            total_seconds = (df['_time'].max() - df['_time'].min()).total_seconds()
+            start = min(frame['_time'].min() for frame in frames)
+            end = max(frame['_time'].max() for frame in frames)
+            total_seconds = (end - start).total_seconds()
             total_hours = total_seconds / 3600
             
             if total_hours == 0:
@@ -357,53 +577,19 @@ class HeatPumpDataQuery:
                 }
             
             # Kompressor runtime - ANVÄNDER VERKLIG TID
-            comp_df = df[df['name'] == 'compressor_status'].copy()
-            comp_runtime_seconds = 0
-            
-            if not comp_df.empty:
-                comp_df = comp_df.sort_values('_time')
-                
-                # Beräkna tiden för varje datapunkt baserat på nästa datapunkt
-                for i in range(len(comp_df) - 1):
-                    if comp_df.iloc[i]['_value'] > 0:  # Om kompressor är PÅ
-                        # Beräkna VERKLIG tid till nästa datapunkt
-                        time_diff = (comp_df.iloc[i + 1]['_time'] - comp_df.iloc[i]['_time']).total_seconds()
-                        comp_runtime_seconds += time_diff
-                
-                # För sista datapunkten, anta samma intervall som föregående
-                if len(comp_df) > 1 and comp_df.iloc[-1]['_value'] > 0:
-                    avg_interval = (comp_df.iloc[-1]['_time'] - comp_df.iloc[-2]['_time']).total_seconds()
-                    comp_runtime_seconds += avg_interval
-            
+            comp_runtime_seconds = active_seconds(by_name.get('compressor_status', pd.DataFrame()))
             comp_runtime_hours = comp_runtime_seconds / 3600
             comp_runtime_percent = (comp_runtime_hours / total_hours * 100) if total_hours > 0 else 0
             
             # Auxiliary heater runtime - ANVÄNDER VERKLIG TID
-            aux_df = df[df['name'] == 'additional_heat_percent'].copy()
-            aux_runtime_seconds = 0
-            
-            if not aux_df.empty:
-                aux_df = aux_df.sort_values('_time')
-                
-                # Beräkna tiden för varje datapunkt baserat på nästa datapunkt
-                for i in range(len(aux_df) - 1):
-                    if aux_df.iloc[i]['_value'] > 0:  # Om tillsats är PÅ
-                        # Beräkna VERKLIG tid till nästa datapunkt
-                        time_diff = (aux_df.iloc[i + 1]['_time'] - aux_df.iloc[i]['_time']).total_seconds()
-                        aux_runtime_seconds += time_diff
-                
-                # För sista datapunkten, anta samma intervall som föregående
-                if len(aux_df) > 1 and aux_df.iloc[-1]['_value'] > 0:
-                    avg_interval = (aux_df.iloc[-1]['_time'] - aux_df.iloc[-2]['_time']).total_seconds()
-                    aux_runtime_seconds += avg_interval
-            
+            aux_runtime_seconds = active_seconds(by_name.get('additional_heat_percent', pd.DataFrame()))
             aux_runtime_hours = aux_runtime_seconds / 3600
             aux_runtime_percent = (aux_runtime_hours / total_hours * 100) if total_hours > 0 else 0
             
-            logger.info(f"Runtime calculation for {time_range}:")
-            logger.info(f"  Total period: {total_hours:.2f} hours")
-            logger.info(f"  Compressor: {comp_runtime_hours:.2f}h ({comp_runtime_percent:.1f}%)")
-            logger.info(f"  Aux heater: {aux_runtime_hours:.2f}h ({aux_runtime_percent:.1f}%)")
+            logger.debug("Runtime calculation for %s:", time_range)
+            logger.debug("  Total period: %.2f hours", total_hours)
+            logger.debug("  Compressor: %.2fh (%.1f%%)", comp_runtime_hours, comp_runtime_percent)
+            logger.debug("  Aux heater: %.2fh (%.1f%%)", aux_runtime_hours, aux_runtime_percent)
             
             return {
                 'compressor_runtime_hours': round(comp_runtime_hours, 1),
@@ -414,7 +600,7 @@ class HeatPumpDataQuery:
             }
             
         except Exception as e:
-            logger.error(f"Error calculating runtime stats: {e}")
+            logger.error("Error calculating runtime stats: %s", e)
             return {
                 'compressor_runtime_hours': 0,
                 'compressor_runtime_percent': 0,
@@ -423,6 +609,7 @@ class HeatPumpDataQuery:
                 'total_hours': 0
             }
     
+    @_memoized
     def analyze_hot_water_cycles(self, time_range: str = '7d') -> Dict[str, Any]:
         """
         Analyze hot water heating cycles
@@ -430,10 +617,8 @@ class HeatPumpDataQuery:
         KORRIGERAD: Använder nu korrekt effekt under varmvattencykler
         """
         try:
-            metrics = ['switch_valve_status', 'hot_water_top', 'power_consumption']
-            
             # Använd finare aggregering för varmvattenanalys
-            df = self.query_metrics(metrics, time_range, aggregation_window='1m')
+            df = self.query_metrics(_HOT_WATER_METRICS, time_range, aggregation_window='1m')
             
             if df.empty:
                 return {
@@ -443,10 +628,11 @@ class HeatPumpDataQuery:
                     'cycles_per_day': 0
                 }
             
-            valve_df = df[df['name'] == 'switch_valve_status'].copy()
-            power_df = df[df['name'] == 'power_consumption'].copy()
+            by_name = split_by_name(df)
+            valve_df = by_name.get('switch_valve_status')
+            power_df = by_name.get('power_consumption', pd.DataFrame(columns=['_time', '_value']))
             
-            if valve_df.empty:
+            if valve_df is None:
                 return {
                     'total_cycles': 0,
                     'avg_cycle_duration_minutes': 0,
@@ -457,17 +643,21 @@ class HeatPumpDataQuery:
             valve_df = valve_df.sort_values('_time')
             power_df = power_df.sort_values('_time')
             
+            valve_times = valve_df['_time'].values
+            valve_values = valve_df['_value'].to_numpy(dtype=float)
+            power_times = power_df['_time'].values
+            power_values = power_df['_value'].to_numpy(dtype=float)
+            
             # Detect cycles (transitions from 0 to 1)
-            valve_df['prev_value'] = valve_df['_value'].shift(1)
-            cycles_start = valve_df[(valve_df['_value'] == 1) & (valve_df['prev_value'] == 0)]
+            start_positions = np.flatnonzero((valve_values[1:] == 1) & (valve_values[:-1] == 0)) + 1
             
-            num_cycles = len(cycles_start)
+            num_cycles = len(start_positions)
             
-            logger.info(f"Hot water cycle detection for {time_range}:")
-            logger.info(f"  Detected {num_cycles} valve transitions (0→1)")
+            logger.debug("Hot water cycle detection for %s:", time_range)
+            logger.debug("  Detected %d valve transitions (0→1)", num_cycles)
             
             if num_cycles == 0:
-                logger.info("  No valve transitions detected - växelventilen har inte slagit över till varmvatten")
+                logger.debug("  No valve transitions detected - växelventilen har inte slagit över till varmvatten")
                 return {
                     'total_cycles': 0,
                     'avg_cycle_duration_minutes': 0,
@@ -484,51 +674,52 @@ class HeatPumpDataQuery:
             
             filtered_count = 0
             
-            for start_time in cycles_start['_time']:
-                after_start = valve_df[valve_df['_time'] > start_time]
-                end_times = after_start[after_start['_value'] == 0]
-                
-                if not end_times.empty:
-                    end_time = end_times.iloc[0]['_time']
+            # Cykelns slut är första punkten efter start där ventilen är 0 -
+            # slås upp med binärsökning istället för att filtrera om hela
+            # ventil- och effektserien för varje cykel
+            off_positions = np.flatnonzero(valve_values == 0)
+            end_lookup = np.searchsorted(off_positions, start_positions, side='right')
+            
+            for start_position, end_index in zip(start_positions, end_lookup):
+                if end_index < len(off_positions):
+                    start_time = pd.Timestamp(valve_times[start_position])
+                    end_time = pd.Timestamp(valve_times[off_positions[end_index]])
                     duration_seconds = (end_time - start_time).total_seconds()
                     duration_minutes = duration_seconds / 60
                     
                     # FILTER: Skippa cykler kortare än minimum
                     if duration_minutes < MIN_CYCLE_DURATION_MINUTES:
                         filtered_count += 1
-                        logger.info(f"  ❌ FILTRERAD kort cykel kl {start_time.strftime('%H:%M:%S')}: {duration_minutes:.1f} min (< {MIN_CYCLE_DURATION_MINUTES} min)")
+                        logger.debug("  ❌ FILTRERAD kort cykel kl %s: %.1f min (< %d min)",
+                                     start_time.strftime('%H:%M:%S'), duration_minutes, MIN_CYCLE_DURATION_MINUTES)
                         continue
                     
                     cycle_durations.append(duration_minutes)
                     
                     # KORRIGERING: Beräkna energi för DENNA specifika cykel
-                    # Hämta effektdata under denna cykel
-                    cycle_power = power_df[
-                        (power_df['_time'] >= start_time) & 
-                        (power_df['_time'] <= end_time)
-                    ].copy()
+                    # Hämta effektdata under denna cykel (start <= tid <= slut)
+                    first = np.searchsorted(power_times, valve_times[start_position], side='left')
+                    last = np.searchsorted(power_times, valve_times[off_positions[end_index]], side='right')
                     
-                    if not cycle_power.empty:
+                    if last > first:
                         # Beräkna energi genom att integrera effekt över tid
-                        cycle_power = cycle_power.sort_values('_time')
-                        cycle_power['time_diff_hours'] = cycle_power['_time'].diff().dt.total_seconds() / 3600
-                        cycle_power['time_diff_hours'] = cycle_power['time_diff_hours'].fillna(0)
-                        
                         # Energy = Power (W) * Time (h) / 1000 = kWh
-                        cycle_power['energy_kwh'] = (cycle_power['_value'] * cycle_power['time_diff_hours']) / 1000
-                        
-                        total_cycle_energy = cycle_power['energy_kwh'].sum()
+                        time_diff_hours = np.diff(power_times[first:last]).astype('timedelta64[ns]').astype(np.int64) / 3.6e12
+                        total_cycle_energy = float((power_values[first + 1:last] * time_diff_hours).sum()) / 1000
                         cycle_energies.append(total_cycle_energy)
                         
-                        logger.info(f"  ✅ GILTIG cykel kl {start_time.strftime('%H:%M:%S')}: {duration_minutes:.1f} min, {total_cycle_energy:.2f} kWh")
+                        logger.debug("  ✅ GILTIG cykel kl %s: %.1f min, %.2f kWh",
+                                     start_time.strftime('%H:%M:%S'), duration_minutes, total_cycle_energy)
             
             # Antal giltiga cykler (efter filtrering)
             num_valid_cycles = len(cycle_durations)
             
-            logger.info(f"  Totalt: {num_valid_cycles} giltiga cykler, {filtered_count} filtrerade (<{MIN_CYCLE_DURATION_MINUTES} min)")
+            logger.debug("  Totalt: %d giltiga cykler, %d filtrerade (<%d min)",
+                         num_valid_cycles, filtered_count, MIN_CYCLE_DURATION_MINUTES)
             
             if num_valid_cycles == 0:
-                logger.warning(f"⚠️  Inga giltiga varmvattencykler hittades - alla {filtered_count} cykler var < {MIN_CYCLE_DURATION_MINUTES} min!")
+                logger.warning("⚠️  Inga giltiga varmvattencykler hittades - alla %d cykler var < %d min!",
+                               filtered_count, MIN_CYCLE_DURATION_MINUTES)
                 logger.warning("   → Kontrollera växelventilsgrafen för att se vad som händer")
                 return {
                     'total_cycles': 0,
@@ -544,11 +735,11 @@ class HeatPumpDataQuery:
             total_days = (valve_df['_time'].max() - valve_df['_time'].min()).total_seconds() / 86400
             cycles_per_day = num_valid_cycles / total_days if total_days > 0 else 0
             
-            logger.info(f"Hot water analysis for {time_range}:")
-            logger.info(f"  Total cycles: {num_valid_cycles} (filtered, min {MIN_CYCLE_DURATION_MINUTES} min)")
-            logger.info(f"  Avg duration: {avg_duration:.1f} min")
-            logger.info(f"  Avg energy: {avg_energy_kwh:.2f} kWh")
-            logger.info(f"  Cycles/day: {cycles_per_day:.1f}")
+            logger.debug("Hot water analysis for %s:", time_range)
+            logger.debug("  Total cycles: %d (filtered, min %d min)", num_valid_cycles, MIN_CYCLE_DURATION_MINUTES)
+            logger.debug("  Avg duration: %.1f min", avg_duration)
+            logger.debug("  Avg energy: %.2f kWh", avg_energy_kwh)
+            logger.debug("  Cycles/day: %.1f", cycles_per_day)
             
             return {
                 'total_cycles': num_valid_cycles,
@@ -558,7 +749,7 @@ class HeatPumpDataQuery:
             }
             
         except Exception as e:
-            logger.error(f"Error analyzing hot water cycles: {e}")
+            logger.error("Error analyzing hot water cycles: %s", e)
             return {
                 'total_cycles': 0,
                 'avg_cycle_duration_minutes': 0,
@@ -590,10 +781,7 @@ class HeatPumpDataQuery:
                         |> last()
                 '''
                 
-                result = self.query_api.query_data_frame(query)
-                
-                if isinstance(result, list):
-                    result = pd.concat(result, ignore_index=True)
+                result = self._query_data_frame(query)
                 
                 if not result.empty:
                     alarm_time = result.iloc[0]['_time']
@@ -611,7 +799,7 @@ class HeatPumpDataQuery:
             }
             
         except Exception as e:
-            logger.error(f"Error getting alarm status: {e}")
+            logger.error("Error getting alarm status: %s", e)
             return {
                 'is_alarm': False,
                 'alarm_code': 0,
@@ -620,6 +808,7 @@ class HeatPumpDataQuery:
                 'alarm_status_raw': 0
             }
     
+    @_memoized
     def get_event_log(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get recent events (state changes) from the heat pump
@@ -636,20 +825,13 @@ class HeatPumpDataQuery:
             events = []
             
             # Hämta state changes för de senaste 24 timmarna
-            metrics = [
-                'compressor_status',
-                'brine_pump_status', 
-                'radiator_pump_status',
-                'switch_valve_status',
-                'additional_heat_percent',
-                'alarm_code'
-            ]
+            metrics = _EVENT_METRICS
             
-            logger.info(f"Fetching event log for {len(metrics)} metrics...")
+            logger.debug("Fetching event log for %d metrics...", len(metrics))
             
-            for metric in metrics:
-                # Aggregera till 1-minuters intervall
-                query = f'''
+            # Aggregera till 1-minuters intervall
+            queries = [
+                f'''
                     from(bucket: "{self.bucket}")
                         |> range(start: -24h)
                         |> filter(fn: (r) => r._measurement == "heatpump")
@@ -657,35 +839,31 @@ class HeatPumpDataQuery:
                         |> aggregateWindow(every: 1m, fn: mean, createEmpty: false)
                         |> yield(name: "mean")
                 '''
-                
-                logger.debug(f"Querying metric: {metric}")
-                result = self.query_api.query_data_frame(query)
-                
-                if isinstance(result, list):
-                    result = pd.concat(result, ignore_index=True)
-                
+                for metric in metrics
+            ]
+            
+            # Kör alla frågor parallellt, bearbeta resultaten i ordning
+            for metric, result in zip(metrics, self._executor.map(self._query_data_frame, queries)):
                 if result.empty:
-                    logger.debug(f"No data for {metric}")
+                    logger.debug("No data for %s", metric)
                     continue
                 
-                logger.info(f"Got {len(result)} rows for {metric}")
+                logger.debug("Got %d rows for %s", len(result), metric)
                 
                 result = result.sort_values('_time')
                 
-                # Detektera state changes
-                result['prev_value'] = result['_value'].shift(1)
+                # Detektera state changes - bara rader där värdet skiljer sig
+                # från föregående kan ge en händelse, så övriga hoppas över
+                # utan att bygga en rad per datapunkt
+                values = result['_value'].to_numpy(dtype=float)
+                changed = np.flatnonzero(values[1:] != values[:-1]) + 1
                 
                 # Räkna antal changes
                 changes_detected = 0
                 
-                for idx, row in result.iterrows():
-                    if pd.isna(row['prev_value']):
-                        continue
-                    
-                    current = row['_value']
-                    previous = row['prev_value']
-                    timestamp = row['_time']
-                    
+                for timestamp, current, previous in zip(result['_time'].iloc[changed],
+                                                        values[changed].tolist(),
+                                                        values[changed - 1].tolist()):
                     # Kompressor
                     if metric == 'compressor_status':
                         if current > 0 and previous == 0:
@@ -809,9 +987,9 @@ class HeatPumpDataQuery:
                             })
                             changes_detected += 1
                 
-                logger.info(f"Detected {changes_detected} changes for {metric}")
+                logger.debug("Detected %d changes for %s", changes_detected, metric)
             
-            logger.info(f"Total events before sorting: {len(events)}")
+            logger.debug("Total events before sorting: %d", len(events))
             
             # Sortera efter tid (senaste först)
             events = sorted(events, key=lambda x: x['time'], reverse=True)
@@ -819,10 +997,10 @@ class HeatPumpDataQuery:
             # Begränsa till antal
             events = events[:limit]
             
-            logger.info(f"Returning {len(events)} events after limit")
+            logger.debug("Returning %d events after limit", len(events))
             
             return events
             
         except Exception as e:
-            logger.error(f"Error getting event log: {e}")
+            logger.error("Error getting event log: %s", e)
             return []
@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration for the dashboard
+
+Every worker process has its own InfluxDB client and query cache, so one
+worker with several threads gives the most cache sharing. Add workers
+(GUNICORN_WORKERS) when a single process is CPU bound building figures.
+"""
+
+import os
+
+bind = '0.0.0.0:8050'
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# Callbacks wait on InfluxDB - ge långsamma frågor tid innan workern startas om
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+
+# Ingen preload: InfluxDB-klienten och trådpoolen ska skapas i varje worker,
+# inte före fork
+preload_app = False
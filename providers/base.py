@@ -113,7 +113,8 @@ class HeatPumpProvider(ABC):
         Returns:
             True if register is supported
         """
-        return register_id.upper() in self.registers
+        # Register IDs are normally already canonical - only uppercase on a miss
+        return register_id in self.registers or register_id.upper() in self.registers
 
     def get_register_info(self, register_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -125,7 +126,10 @@ class HeatPumpProvider(ABC):
         Returns:
             Register info dictionary or None if not found
         """
-        return self.registers.get(register_id.upper())
+        register_info = self.registers.get(register_id)
+        if register_info is None:
+            register_info = self.registers.get(register_id.upper())
+        return register_info
 
     def get_registers_by_type(self, register_type: str) -> Dict[str, Any]:
         """